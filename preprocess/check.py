@@ -1,14 +1,31 @@
-import pandas as pd
-import re
 import os
+import csv
+import time
+import sqlite3
+import hashlib
+import argparse
+import itertools
+
+import columnar
+from keyword_matcher import DEFAULT_FIELDS, FIELD_SEPARATOR, KeywordMatcher
+from metrics import StageMetrics
+from parse_cache import CACHE_DISABLED
+
+# 修改匹配逻辑(归一化规则等)时递增，使缓存的旧筛选结果失效
+MATCH_VERSION = 1
+
+# 每条记录的命中关键词缓存，PREPROCESS_NO_CACHE=1 时不使用
+DEFAULT_CACHE = "./.screening-cache.sqlite"
+
+# 每次查询和写回缓存的记录数
+CACHE_BATCH = 5000
 
 # 定义要检查的关键词列表
+# 连字符与空格在匹配时等价，"super-resolution" 与 "super resolution" 只需写一次
 Check_Keywords = [
     "deep learning super-resolution",
-    "deep learning super resolution",
     "signal reconstruction",
     "super-resolution", 
-    "super resolution",
     "spectral resolution",
     "low-resolution spectra",
     "low resolution",
@@ -25,30 +42,221 @@ Check_Keywords = [
     "astronomical parameter prediction",
 ]
 
-# 确保目标目录存在
-os.makedirs("./result", exist_ok=True)
+def iter_input_rows(input_file):
+    """
+    流式读取待筛选文件：第一个产出的是表头，之后逐行产出值列表
+
+    与 pandas.read_csv 一样跳过空行，字段不足的行用空字符串补齐；中间结果也可以是Parquet文件
+    """
+    if columnar.is_columnar(input_file):
+        header = columnar.read_headers(input_file)
+        yield header
+        for row in columnar.iter_dict_rows(input_file):
+            yield [row[name] for name in header]
+        return
+
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if header:
+            header[0] = header[0].lstrip('\ufeff')
+        yield header
+        width = len(header)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield row
+
+def record_key(columns, fields):
+    """缓存键 = 匹配逻辑版本 + 待筛选列名 + 各列内容的哈希，记录内容变化后自动重新筛选"""
+    payload = f"{MATCH_VERSION}\x1e{FIELD_SEPARATOR.join(columns)}\x1e{FIELD_SEPARATOR.join(fields)}"
+    # 8字节哈希作为SQLite的整数主键，查询比文本键快
+    return int.from_bytes(hashlib.blake2b(payload.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+class ScreeningCache:
+    """
+    SQLite 中的 {记录键: (关键词集合编号, 命中的归一化关键词)}
+
+    每条记录的命中集合与筛选时使用的关键词集合一起保存。关键词列表变化后，
+    旧的命中集合去掉已删除的关键词，再只用新增的关键词匹配一次即可，不必重新匹配全部关键词。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS keyword_sets (id INTEGER PRIMARY KEY, terms TEXT NOT NULL UNIQUE)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS screened (key INTEGER PRIMARY KEY, keyword_set INTEGER NOT NULL, "
+            "hits TEXT NOT NULL, updated REAL)")
+        self._keyword_sets = {}
+        self._delta_matchers = {}
+
+    def keyword_set_id(self, terms):
+        """登记一个归一化关键词集合，返回其编号"""
+        text = FIELD_SEPARATOR.join(sorted(terms))
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO keyword_sets (terms) VALUES (?)", (text,))
+        return self.connection.execute("SELECT id FROM keyword_sets WHERE terms = ?", (text,)).fetchone()[0]
+
+    def keyword_set(self, set_id):
+        if set_id not in self._keyword_sets:
+            row = self.connection.execute("SELECT terms FROM keyword_sets WHERE id = ?", (set_id,)).fetchone()
+            self._keyword_sets[set_id] = frozenset(row[0].split(FIELD_SEPARATOR)) if row and row[0] else frozenset()
+        return self._keyword_sets[set_id]
+
+    def get_many(self, keys):
+        """批量查询，返回 {键: (关键词集合编号, 命中集合)}，只包含已缓存的键"""
+        found = {}
+        keys = list(set(keys))
+        # SQLite 对单条语句的参数个数有上限，分批查询
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            query = f"SELECT key, keyword_set, hits FROM screened WHERE key IN ({','.join('?' * len(chunk))})"
+            for key, set_id, hits in self.connection.execute(query, chunk):
+                found[key] = (set_id, frozenset(hits.split(FIELD_SEPARATOR)) if hits else frozenset())
+        return found
+
+    def put_many(self, entries):
+        """entries 为 {键: (关键词集合编号, 命中集合)}"""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO screened VALUES (?, ?, ?, ?)",
+                [(key, set_id, FIELD_SEPARATOR.join(sorted(hits)), now) for key, (set_id, hits) in entries.items()])
+
+    def screen(self, matcher, columns, field_rows, stats):
+        """
+        返回每条记录在 matcher 下命中的归一化关键词集合，只匹配缓存中没有的记录和新增的关键词
+
+        stats 按 cache.hit(直接复用)、cache.delta(只匹配新增关键词)、cache.miss(完整匹配)计数
+        """
+        terms = matcher.terms
+        current = self.keyword_set_id(terms)
+        keys = [record_key(columns, fields) for fields in field_rows]
+        cached = self.get_many(keys)
+        results = []
+        updates = {}
+        for key, fields in zip(keys, field_rows):
+            entry = cached.get(key)
+            if entry is None:
+                hits = matcher.matched_terms(*fields)
+                stats.count("cache.miss")
+            elif entry[0] == current:
+                results.append(entry[1])
+                stats.count("cache.hit")
+                continue
+            else:
+                set_id, previous = entry
+                added = terms - self.keyword_set(set_id)
+                hits = previous & terms
+                if added:
+                    if (set_id, current) not in self._delta_matchers:
+                        self._delta_matchers[(set_id, current)] = KeywordMatcher(sorted(added))
+                    hits |= self._delta_matchers[(set_id, current)].matched_terms(*fields)
+                stats.count("cache.delta")
+            results.append(hits)
+            updates[key] = (current, hits)
+        if updates:
+            self.put_many(updates)
+        return results
+
+    def close(self):
+        self.connection.close()
+
+def screen(input_file="./result/combined_paper.csv", output_file="./result/Screening.csv",
+           keywords=Check_Keywords, hits_output="./result/Screening-keywords.csv", cache_file=None):
+    """
+    用组合关键词匹配器筛选论文，单次遍历同时检查 Title、Abstract 和 Author Keywords
+
+    逐行读取并立即写出命中的行，只用标准库 csv 模块，不需要导入 pandas。
+    给出 cache_file 时每条记录的命中结果缓存在该SQLite文件中，重新运行时只匹配新增或修改过的记录；
+    关键词列表变化时只需匹配新增的关键词。
+
+    参数:
+    input_file -- 待筛选的CSV文件
+    output_file -- 筛选结果的输出文件
+    keywords -- 关键词列表
+    hits_output -- 每篇命中论文对应关键词的输出文件(为None则不输出)
+    cache_file -- 筛选结果缓存文件(为None或设置了 PREPROCESS_NO_CACHE 时不使用缓存)
+
+    返回命中的论文数
+    """
+    # 确保目标目录存在
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    stats = StageMetrics("screen")
+    rows = iter_input_rows(input_file)
+    header = next(rows)
+
+    # 关键词只编译一次
+    matcher = KeywordMatcher(keywords)
+    fields = [c for c in DEFAULT_FIELDS if c in header]
+    columns = [header.index(c) for c in fields]
+    hit_columns = [header.index(c) for c in ("Title", "DOI") if c in header]
+    cache = ScreeningCache(cache_file) if cache_file and not CACHE_DISABLED else None
+
+    # 单次遍历所有待筛选列，命中任意关键词的行立即写出，并记录每行命中的关键词；
+    # 使用缓存时按批查询和写回
+    total = 0
+    hits = []
+    try:
+        with open(output_file, 'w', encoding='utf-8', newline='') as out:
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(header)
+            while True:
+                batch = list(itertools.islice(rows, CACHE_BATCH))
+                if not batch:
+                    break
+                field_rows = [tuple(row[i] for i in columns) for row in batch]
+                if cache is None:
+                    matched = [matcher.matched_terms(*values) for values in field_rows]
+                else:
+                    matched = cache.screen(matcher, fields, field_rows, stats)
+                total += len(batch)
+                for row, terms in zip(batch, matched):
+                    if terms:
+                        writer.writerow(row)
+                        hits.append([row[i] for i in hit_columns] + ["; ".join(matcher.names(terms))])
+    finally:
+        if cache is not None:
+            cache.close()
 
-# 读取CSV文件
-df = pd.read_csv("./result/combined_paper.csv")
+    # 保存每篇论文命中的关键词
+    if hits_output:
+        with open(hits_output, 'w', encoding='utf-8', newline='') as out:
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow([header[i] for i in hit_columns] + ["Matched_Keywords"])
+            writer.writerows(hits)
 
-# 转换关键词为小写便于不区分大小写匹配
-keywords_lower = [keyword.lower() for keyword in Check_Keywords]
+    stats.record(total)
+    stats.count("matched", len(hits))
+    stats.finish()
 
-# 定义函数来检查标题是否包含关键词
-def contains_keyword(title):
-    if not isinstance(title, str):
-        return False
-    title_lower = title.lower()
-    for keyword in keywords_lower:
-        if keyword in title_lower:
-            return True
-    return False
+    print(f"筛选完成。找到 {len(hits)} 篇包含关键词的论文。")
+    print(f"结果已保存至 {output_file}")
+    return len(hits)
 
-# 筛选包含关键词的行
-filtered_df = df[df['Title'].apply(contains_keyword)]
+def main():
+    parser = argparse.ArgumentParser(description="按关键词筛选论文")
+    parser.add_argument("--input", default="./result/combined_paper.csv", help="待筛选的CSV文件")
+    parser.add_argument("--output", default="./result/Screening.csv", help="筛选结果的输出文件")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="每条记录的筛选结果缓存(SQLite文件)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用筛选结果缓存，重新匹配全部记录")
+    parser.add_argument("--rank", action="store_true",
+                        help="不做是/否筛选，改为按相关度(BM25/TF-IDF)排序并附加得分列，见 rank.py")
+    parser.add_argument("--top", type=int, default=None, help="排序模式下只输出得分最高的K条记录")
+    parser.add_argument("--min-score", type=float, default=None, help="排序模式下只输出得分不低于该值的记录")
+    parser.add_argument("--scheme", choices=("bm25", "tfidf"), default="bm25", help="排序模式的打分方案")
+    args = parser.parse_args()
 
-# 保存筛选结果到新文件
-filtered_df.to_csv("./result/Screening.csv", index=False)
+    if args.rank:
+        from rank import rank_screen
+        rank_screen(args.input, args.output, Check_Keywords, args.top, args.min_score, args.scheme)
+    else:
+        screen(args.input, args.output, cache_file=None if args.no_cache else args.cache)
 
-print(f"筛选完成。找到 {len(filtered_df)} 篇包含关键词的论文。")
-print(f"结果已保存至 ./result/Screening.csv") 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+"""
+中间文件的列式存储(Parquet)
+
+spec-csv 下的解析结果、result/output.parquet 等只给下一阶段读取的中间文件可以保存为 Parquet：
+按列存储，Publication、Year 这类大量重复的取值经过字典编码后只保存一次，文件更小；
+读取时不需要逐字符解析引号和逗号，也可以只读需要的列。
+面向人工查看的文件(combined_paper.csv、Screening.csv 等)仍然写成CSV。
+
+所有列都按字符串保存，空值写为空字符串，与 csv.DictReader 读出的内容一致。
+需要安装 pyarrow；未安装时只有用到 Parquet 文件的功能会报错，CSV流程不受影响。
+
+用法: python columnar.py 输入文件 输出文件   在CSV和Parquet之间转换(按扩展名判断)
+"""
+
+import sys
+import os
+import csv
+import time
+
+PARQUET_EXTENSION = ".parquet"
+
+# 每个行组的记录数，流式写出时也是内存中缓冲的行数
+ROW_GROUP_SIZE = 65536
+
+COMPRESSION = "zstd"
+
+
+def is_columnar(path):
+    """按扩展名判断是否为Parquet文件"""
+    return os.fspath(path).lower().endswith(PARQUET_EXTENSION)
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("读写 Parquet 文件需要安装 pyarrow (pip install pyarrow)") from e
+    return pyarrow, pyarrow.parquet
+
+
+def _table(fieldnames, columns):
+    pa, _ = _arrow()
+    return pa.table({name: pa.array(values, type=pa.string()) for name, values in zip(fieldnames, columns)})
+
+
+class DictWriter:
+    """
+    与 csv.DictWriter 用法相同的 Parquet 写出器，按行组缓冲，内存与 ROW_GROUP_SIZE 成正比
+
+    缺少的字段写为空字符串；必须调用 close(或用作上下文管理器)才会写出最后一个行组和文件尾。
+    """
+
+    def __init__(self, path, fieldnames, row_group_size=ROW_GROUP_SIZE):
+        pa, pq = _arrow()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.fieldnames = list(fieldnames)
+        self.row_group_size = row_group_size
+        schema = pa.schema([(name, pa.string()) for name in self.fieldnames])
+        self._writer = pq.ParquetWriter(path, schema, compression=COMPRESSION, use_dictionary=True)
+        self._columns = [[] for _ in self.fieldnames]
+        self.count = 0
+
+    def writeheader(self):
+        """表头保存在文件的schema中，这里什么也不做"""
+
+    def writerow(self, row):
+        for name, column in zip(self.fieldnames, self._columns):
+            value = row.get(name)
+            column.append("" if value is None else value)
+        self.count += 1
+        if len(self._columns[0]) >= self.row_group_size:
+            self._flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def write_tuples(self, rows):
+        """按 fieldnames 顺序的元组(或 Record)逐行写出"""
+        columns = self._columns
+        for row in rows:
+            for column, value in zip(columns, row):
+                column.append("" if value is None else value)
+            self.count += 1
+            if len(columns[0]) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if self._columns and self._columns[0]:
+            self._writer.write_table(_table(self.fieldnames, self._columns), row_group_size=self.row_group_size)
+            # 原地清空，write_tuples 中持有的列表引用仍然有效
+            for column in self._columns:
+                column.clear()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def write_records(records, path, fieldnames):
+    """将按 fieldnames 顺序迭代的记录(元组、Record)写为Parquet，返回写出的记录数"""
+    with DictWriter(path, fieldnames) as writer:
+        writer.write_tuples(records)
+    return writer.count
+
+
+def read_headers(path):
+    """Parquet文件的列名"""
+    _, pq = _arrow()
+    return list(pq.read_schema(path).names)
+
+
+def iter_dict_rows(path, columns=None):
+    """按行组流式读取，逐行产出 {列名: 值} 字典；columns 给出时只读取这些列"""
+    _, pq = _arrow()
+    parquet = pq.ParquetFile(path)
+    names = columns or parquet.schema_arrow.names
+    for batch in parquet.iter_batches(columns=names):
+        data = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+        for values in zip(*data):
+            yield dict(zip(names, values))
+
+
+def iter_column(path, name):
+    """只读取一列，逐个产出值；文件中没有该列时不产出任何值"""
+    _, pq = _arrow()
+    parquet = pq.ParquetFile(path)
+    if name not in parquet.schema_arrow.names:
+        return
+    for batch in parquet.iter_batches(columns=[name]):
+        yield from batch.column(0).to_pylist()
+
+
+def read_dataframe(path, columns=None):
+    """读取为 pandas DataFrame(所有列为字符串)"""
+    _, pq = _arrow()
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+def convert(input_path, output_path):
+    """在CSV和Parquet之间转换，返回记录数"""
+    if is_columnar(input_path):
+        fieldnames = read_headers(input_path)
+        count = 0
+        with open(output_path, 'w', encoding='utf-8', newline='') as out:
+            writer = csv.DictWriter(out, fieldnames=fieldnames, lineterminator='\n')
+            writer.writeheader()
+            for row in iter_dict_rows(input_path):
+                writer.writerow(row)
+                count += 1
+        return count
+    with open(input_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        with DictWriter(output_path, reader.fieldnames or []) as writer:
+            writer.writerows(reader)
+    return writer.count
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("用法: python columnar.py 输入文件 输出文件", file=sys.stderr)
+        sys.exit(1)
+    input_path, output_path = sys.argv[1:]
+    if not os.path.exists(input_path):
+        print(f"错误: 文件 {input_path} 不存在", file=sys.stderr)
+        sys.exit(1)
+    start = time.perf_counter()
+    count = convert(input_path, output_path)
+    print(f"已将 {count} 条记录从 {input_path} 转换到 {output_path}，"
+          f"{os.path.getsize(input_path) / 1024:.0f} KB -> {os.path.getsize(output_path) / 1024:.0f} KB，"
+          f"用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,142 +2,482 @@
 
 """
 Simple script to convert NASA ADS BibTeX to CSV format.
+
+流式解析：逐行读取，每个条目闭合时立即输出对应的CSV行，内存占用与文件大小无关。
+很大的文件可用 --jobs 在文件内部并行解析：文件经内存映射后在 @TYPE{ 条目起始处切分为若干块，
+各块在进程池中解析，再按原顺序合并，输出与顺序解析完全相同。
+用法: python convert_bib.py < input.bib > output.csv
+      python convert_bib.py [--jobs N] input1.bib [input2.bib ...] > output.csv
+      python convert_bib.py --min-year 2015 --venue "The Astrophysical Journal" input.bib > output.csv
 """
 
 import sys
+import os
+import io
 import re
+import mmap
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 
-# 强制刷新stdout，确保输出可见
-sys.stdout.reconfigure(line_buffering=True)
-
-entries = []
-current_entry = {}
-reading_entry = False
+import columnar
+import metrics
+from metrics import StageMetrics
+from parse_cache import cached_records
+import record_filter as filters
+import records
+from records import Record
 
 # 从stderr重定向debug输出
 debug_out = sys.stderr
 
-# 读取BibTeX
-for line in sys.stdin:
-    line = line.strip()
-    
-    # 开始新条目
-    if line.startswith('@'):
-        if current_entry and reading_entry:
-            entries.append(current_entry)
-        current_entry = {}
-        reading_entry = True
-        continue
-    
-    # 结束当前条目
-    if line == "}" and reading_entry:
-        if current_entry:
-            entries.append(current_entry)
-        current_entry = {}
-        reading_entry = False
-        continue
-    
-    # 解析条目中的字段
-    if reading_entry and "=" in line:
+# 解析逻辑改变时递增，使旧的解析缓存失效
+PARSER_VERSION = 2
+
+# CSV表头 - 包含DOI字段
+CSV_HEADER = ",".join(records.CSV_HEADER)
+
+# 不产生记录的特殊条目类型
+SKIP_ENTRY_TYPES = {"comment", "string", "preamble"}
+
+# 替换常见的LaTeX期刊缩写
+JOURNAL_MAP = {
+    "\\mnras": "Monthly Notices of the Royal Astronomical Society",
+    "\\apj": "The Astrophysical Journal",
+    "\\aap": "Astronomy and Astrophysics",
+    "\\aj": "The Astronomical Journal"
+}
+
+_ENTRY_START_RE = re.compile(r'@\s*(\w+)\s*\{')
+_FIELD_RE = re.compile(r'\s*([^\s=,{}"#]+)\s*=\s*')
+_BRACE_RE = re.compile(r'[{}]')
+_QUOTE_RE = re.compile(r'[{}"]')
+_BARE_RE = re.compile(r'[^\s,}#]+')
+_NEWLINE_WS_RE = re.compile(r'\s*\n\s*')
+_STRIP_BRACES_RE = re.compile(r'\{|\}')
+
+# 文件内并行解析：小于 PARALLEL_MIN_BYTES 的文件顺序解析；每块的大小在上下限之间，
+# 尽量让每个进程分到约 CHUNKS_PER_JOB 块以均衡负载
+PARALLEL_MIN_BYTES = 16 * 1024 ** 2
+MIN_CHUNK_BYTES = 1024 ** 2
+MAX_CHUNK_BYTES = 64 * 1024 ** 2
+CHUNKS_PER_JOB = 4
+
+# 块的切分点：行首的 @TYPE{
+_CHUNK_BOUNDARY_RE = re.compile(rb'\n@[ \t]*\w+[ \t]*\{')
+
+
+def iter_entry_texts(stream, tail=None):
+    """
+    逐行读取BibTeX，按大括号深度切分出每个完整条目的原始文本
+
+    只缓存当前条目的行，条目闭合后立即产出，因此支持跨行的字段值和嵌套大括号。
+    tail 为列表时，输入结束时尚未闭合的条目不产出，而是把已缓存的行放入 tail，
+    由调用方接上后续内容继续解析(用于分块解析)。
+    """
+    buf = []
+    depth = 0
+    opened = False
+    for line in stream:
+        while line:
+            if not buf:
+                # 条目之外的内容全部忽略，直到遇到下一个 @
+                at = line.find('@')
+                if at == -1:
+                    break
+                line = line[at:]
+                depth = 0
+                opened = False
+
+            # 大多数行不会让条目闭合，用 str.count 快速累计深度
+            opens = line.count('{')
+            closes = line.count('}')
+            if not opened and opens:
+                opened = True
+            if not opened or depth + opens - closes > 0:
+                buf.append(line)
+                depth += opens - closes
+                break
+
+            # 本行内条目闭合，找到闭合位置，剩余部分可能是下一个条目
+            end = len(line)
+            for match in _BRACE_RE.finditer(line):
+                depth += 1 if match.group() == '{' else -1
+                if depth == 0:
+                    end = match.end()
+                    break
+            buf.append(line[:end])
+            yield ''.join(buf)
+            buf = []
+            line = line[end:]
+
+    if tail is not None:
+        tail.extend(buf)
+        return
+
+    # 文件结尾仍未闭合的条目按已读内容处理
+    if buf and opened:
+        yield ''.join(buf)
+
+
+def _read_value(text, pos):
+    """从 pos 处读取一个值单元(大括号、双引号或裸值)，返回(内容, 结束位置)"""
+    if pos >= len(text):
+        return "", pos
+    first = text[pos]
+    if first == '{':
+        depth = 1
+        for match in _BRACE_RE.finditer(text, pos + 1):
+            depth += 1 if match.group() == '{' else -1
+            if depth == 0:
+                return text[pos + 1:match.start()], match.end()
+        return text[pos + 1:], len(text)
+    if first == '"':
+        depth = 0
+        for match in _QUOTE_RE.finditer(text, pos + 1):
+            char = match.group()
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            elif depth == 0:
+                return text[pos + 1:match.start()], match.end()
+        return text[pos + 1:], len(text)
+    match = _BARE_RE.match(text, pos)
+    if not match:
+        return "", pos
+    return match.group(), match.end()
+
+
+def _skip_ws(text, pos):
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def parse_entry_text(text, record_filter=None):
+    """
+    将单个条目的文本解析为 {字段名: 值} 字典，特殊条目返回 None
+
+    record_filter 为 RecordFilter 时，读到 year 或 doi 字段就检查条件，不满足时
+    不再解析其余字段，返回被过滤的原因(字符串)
+    """
+    start = _ENTRY_START_RE.match(text)
+    if not start or start.group(1).lower() in SKIP_ENTRY_TYPES:
+        return None
+
+    # 跳过引用键
+    comma = text.find(',', start.end())
+    if comma == -1:
+        return {}
+
+    entry = {}
+    pos = comma + 1
+    while True:
+        field = _FIELD_RE.match(text, pos)
+        if not field:
+            break
+        pos = field.end()
+
+        # 值可能由 # 连接的多个部分组成
+        parts = []
+        while True:
+            value, pos = _read_value(text, pos)
+            parts.append(value)
+            pos = _skip_ws(text, pos)
+            if pos < len(text) and text[pos] == '#':
+                pos = _skip_ws(text, pos + 1)
+                continue
+            break
+
+        # 跨行的值合并为一行
+        name = field.group(1).lower()
+        value = entry[name] = _NEWLINE_WS_RE.sub(' ', ''.join(parts)).strip()
+        if record_filter is not None:
+            if name == "year" and not record_filter.year_ok(value):
+                return filters.REASON_YEAR
+            if name == "doi" and not record_filter.doi_ok(value):
+                return filters.REASON_DOI_PREFIX
+
+        pos = _skip_ws(text, pos)
+        if pos < len(text) and text[pos] == ',':
+            pos += 1
+    return entry
+
+
+def iter_bib_entries(stream, tail=None, record_filter=None, stats=None):
+    """
+    流式产出每个条目的字段字典，tail 的含义同 iter_entry_texts
+
+    解析途中即被 record_filter 排除的条目不产出，stats 不为None时按 filtered.<原因> 计数
+    """
+    for text in iter_entry_texts(stream, tail):
+        entry = parse_entry_text(text, record_filter)
+        if isinstance(entry, str):
+            if stats is not None:
+                stats.count(f"filtered.{entry}")
+            continue
+        if entry:
+            yield entry
+
+
+def entry_to_row(entry):
+    """将条目字典转换为 Record(作者, 标题, 年份, 出版物, DOI)"""
+    # 作者
+    author = "Unknown"
+    if "author" in entry:
+        # 清理作者格式，移除大括号
+        author = _STRIP_BRACES_RE.sub('', entry["author"])
+
+    # 标题
+    title = "Unknown"
+    if "title" in entry:
+        # 清理标题格式
+        title = _STRIP_BRACES_RE.sub('', entry["title"])
+        title = re.sub(r'^"|"$', '', title)
+
+    # 年份
+    year = "Unknown"
+    if "year" in entry:
+        year = entry["year"]
+
+    # 出版物
+    publication = "Unknown"
+    if "journal" in entry:
+        journal = entry["journal"]
+        # 处理LaTeX格式的期刊名
+        if journal.startswith("\\"):
+            if journal in JOURNAL_MAP:
+                journal = JOURNAL_MAP[journal]
+            else:
+                journal = journal.replace("\\", "")
+
+        # 移除大括号
+        publication = _STRIP_BRACES_RE.sub('', journal)
+
+    # DOI
+    doi = ""
+    if "doi" in entry:
+        # 添加DOI前缀
+        doi_value = entry["doi"].strip()
+        if doi_value:
+            doi = f"https://doi.org/{doi_value}"
+
+    return Record(author, title, year, publication, doi)
+
+
+def format_csv_line(row):
+    """转义双引号并拼接为一行CSV"""
+    return ",".join('"' + value.replace('"', '""') + '"' for value in row)
+
+
+def iter_rows(stream, stats=None, record_filter=None):
+    """
+    流式产出每个条目转换后的 Record，stats 为 StageMetrics 时统计条目数、出错和被过滤的条目
+
+    record_filter 为 RecordFilter 时只产出满足条件的记录
+    """
+    for entry in iter_bib_entries(stream, record_filter=record_filter, stats=stats):
         try:
-            field, value = line.split("=", 1)
-            field = field.strip()
-            value = value.strip()
-            
-            # 移除结尾的逗号
-            if value.endswith(","):
-                value = value[:-1]
-            
-            # 清理值
-            if value.startswith("{") and value.endswith("}"):
-                value = value[1:-1]
-            elif value.startswith('"') and value.endswith('"'):
-                value = value[1:-1]
-            
-            current_entry[field] = value
+            row = entry_to_row(entry)
         except Exception as e:
-            print(f"Error parsing line: {line}", file=debug_out)
-            print(f"Exception: {e}", file=debug_out)
-
-print(f"Processed {len(entries)} entries", file=debug_out)
-
-# 输出CSV头部 - 添加DOI字段
-print("Author,Title,Year,Publication,DOI", flush=True)
-
-# 处理每个条目
-csv_lines = []
-for entry in entries:
-    try:
-        # 作者
-        author = "Unknown"
-        if "author" in entry:
-            # 清理作者格式
-            auth = entry["author"]
-            # 移除大括号
-            auth = re.sub(r'\{|\}', '', auth)
-            author = auth
-        
-        # 标题
-        title = "Unknown"
-        if "title" in entry:
-            # 清理标题格式
-            title = entry["title"]
-            title = re.sub(r'\{|\}', '', title)
-            title = re.sub(r'^"|"$', '', title)
-        
-        # 年份
-        year = "Unknown"
-        if "year" in entry:
-            year = entry["year"]
-        
-        # 出版物
-        publication = "Unknown"
-        if "journal" in entry:
-            journal = entry["journal"]
-            # 处理LaTeX格式的期刊名
-            if journal.startswith("\\"):
-                # 替换常见的LaTeX期刊缩写
-                journal_map = {
-                    "\\mnras": "Monthly Notices of the Royal Astronomical Society",
-                    "\\apj": "The Astrophysical Journal",
-                    "\\aap": "Astronomy and Astrophysics",
-                    "\\aj": "The Astronomical Journal"
-                }
-                if journal in journal_map:
-                    journal = journal_map[journal]
-                else:
-                    journal = journal.replace("\\", "")
-            
-            # 移除大括号
-            journal = re.sub(r'\{|\}', '', journal)
-            publication = journal
-        
-        # DOI
-        doi = ""
-        if "doi" in entry:
-            # 添加DOI前缀
-            doi_value = entry["doi"].strip()
-            if doi_value:
-                doi = f"https://doi.org/{doi_value}"
-        
-        # 转义CSV中的双引号
-        author = author.replace('"', '""')
-        title = title.replace('"', '""')
-        publication = publication.replace('"', '""')
-        doi = doi.replace('"', '""')
-        
-        # 准备CSV行 - 包含DOI
-        csv_line = f'"{author}","{title}","{year}","{publication}","{doi}"'
-        csv_lines.append(csv_line)
-        
-    except Exception as e:
-        print(f"Error processing entry: {entry}", file=debug_out)
-        print(f"Exception: {e}", file=debug_out)
-
-# 输出所有CSV行
-for line in csv_lines:
-    print(line, flush=True)
-
-# 确认脚本执行完成
-print(f"CSV conversion completed with {len(csv_lines)} entries", file=debug_out)
+            if stats is None:
+                print(f"Error processing entry: {entry}", file=debug_out)
+                print(f"Exception: {e}", file=debug_out)
+            else:
+                stats.skip("error", f"Error processing entry: {entry}\nException: {e}")
+            continue
+        if record_filter is not None:
+            reason = record_filter.rejects(row)
+            if reason is not None:
+                if stats is not None:
+                    stats.count(f"filtered.{reason}")
+                continue
+        if stats is not None:
+            stats.record()
+        yield row
+
+
+def _text_stream(raw):
+    """与 open(path, 'r', encoding='utf-8', errors='replace') 相同的解码和换行处理"""
+    return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+
+
+def chunk_offsets(data, jobs):
+    """
+    在条目起始处(行首的 @TYPE{)切分 data，返回各块的起始偏移，最后一项为 len(data)
+
+    每个切分点都紧跟在换行符之后，不会切断多字节的UTF-8字符或 CRLF 换行。
+    """
+    size = len(data)
+    chunk_size = min(MAX_CHUNK_BYTES, max(MIN_CHUNK_BYTES, size // (jobs * CHUNKS_PER_JOB)))
+    offsets = [0]
+    while True:
+        match = _CHUNK_BOUNDARY_RE.search(data, offsets[-1] + chunk_size)
+        if not match:
+            break
+        offsets.append(match.start() + 1)
+    offsets.append(size)
+    return offsets
+
+
+def _parse_chunk(path, start, end, last, record_filter=None):
+    """
+    进程池任务：解析文件中 [start, end) 字节范围内的条目
+
+    返回(行列表, 出错条目的信息列表, 未闭合的尾部, 被过滤条目的计数)。块中最后一个条目未闭合时，
+    说明切分点处于某个条目内部(大括号不配对的畸形条目)，其已读的行作为尾部返回。
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        stream = _text_stream(io.BytesIO(data[start:end]))
+    rows, errors = [], []
+    tail = None if last else []
+    # 只用于累计被过滤的条目数，不登记到报告中
+    filtered = StageMetrics("chunk")
+    for entry in iter_bib_entries(stream, tail, record_filter, filtered):
+        try:
+            row = entry_to_row(entry)
+        except Exception as e:
+            errors.append(f"Error processing entry: {entry}\nException: {e}")
+            continue
+        if record_filter is not None:
+            reason = record_filter.rejects(row)
+            if reason is not None:
+                filtered.count(f"filtered.{reason}")
+                continue
+        rows.append(row)
+    return rows, errors, tail, dict(filtered.counters)
+
+
+def iter_file_rows_parallel(path, jobs, stats, record_filter=None):
+    """
+    在 jobs 个进程中分块解析一个BibTeX文件，按原顺序产出 Record
+
+    同时提交的块数有上限，内存与块大小成正比而不是与文件大小成正比。
+    如果某块结尾的条目未闭合，从该条目开始退回顺序解析，保证输出与顺序解析相同。
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        offsets = chunk_offsets(data, jobs)
+    chunks = list(zip(offsets, offsets[1:]))
+    stats.count("chunks", len(chunks))
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+        pending = iter(enumerate(chunks))
+        futures = [pool.submit(_parse_chunk, path, start, end, i == len(chunks) - 1, record_filter)
+                   for i, (start, end) in itertools.islice(pending, 2 * jobs)]
+        for i in range(len(chunks)):
+            rows, errors, tail, filtered = futures[i].result()
+            futures[i] = None
+            for message in errors:
+                stats.skip("error", message)
+            for name, n in filtered.items():
+                stats.count(name, n)
+            stats.record(len(rows))
+            yield from rows
+            if tail:
+                for future in futures[i + 1:]:
+                    future.cancel()
+                stats.count("sequential_fallback")
+                break
+            for j, (start, end) in itertools.islice(pending, 1):
+                futures.append(pool.submit(_parse_chunk, path, start, end, j == len(chunks) - 1, record_filter))
+        else:
+            return
+
+    # 未闭合的条目跨过了切分点：接上其后的全部内容顺序解析
+    with open(path, 'rb') as raw:
+        raw.seek(chunks[i][1])
+        yield from iter_rows(itertools.chain(tail, _text_stream(raw)), stats, record_filter)
+
+
+def iter_file_rows(path, jobs=1, record_filter=None):
+    """
+    流式产出一个BibTeX文件的所有行，jobs 大于1且文件足够大时在文件内部并行解析
+
+    record_filter 为 RecordFilter 时只产出满足条件的记录
+    """
+    with StageMetrics(f"bib:{os.path.basename(path)}", out=debug_out) as stats:
+        if jobs > 1 and os.path.getsize(path) >= PARALLEL_MIN_BYTES:
+            yield from iter_file_rows_parallel(path, jobs, stats, record_filter)
+            return
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            yield from iter_rows(f, stats, record_filter)
+
+
+def cached_file_rows(path, jobs=1, record_filter=None):
+    """通过解析缓存获取一个BibTeX文件的所有行，内容和过滤条件都未变的文件不会重新解析"""
+    tag = record_filter.cache_tag() if record_filter is not None else ""
+    return cached_records(path, "bib" + tag, PARSER_VERSION, lambda p: iter_file_rows(p, jobs, record_filter))
+
+
+def write_rows(rows, out):
+    """写出CSV行，返回写出的条目数"""
+    count = 0
+    for row in rows:
+        out.write(format_csv_line(row))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def convert_stream(stream, out):
+    """逐条解析并立即写出CSV行，返回写出的条目数"""
+    return write_rows(iter_rows(stream), out)
+
+
+def convert_file(input_path, output_path, jobs=1, record_filter=None):
+    """
+    将一个BibTeX文件转换为CSV文件(扩展名为 .parquet 时为Parquet文件)，返回写出的条目数
+
+    jobs 大于1时在文件内部并行解析，输出不变；record_filter 为 RecordFilter 时只写出满足条件的记录
+    """
+    rows = cached_file_rows(input_path, jobs, record_filter)
+    if columnar.is_columnar(output_path):
+        return columnar.write_records(rows, output_path, records.CSV_HEADER)
+    with open(output_path, 'w', encoding='utf-8', newline='') as out:
+        out.write(CSV_HEADER + "\n")
+        return write_rows(rows, out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert NASA ADS BibTeX to CSV format.")
+    parser.add_argument("files", nargs="*", help="BibTeX files (default: read stdin)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="parse each large file in N processes (default: all CPU cores)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="report every problem entry")
+    parser.add_argument("--metrics", default=None, help="save run metrics as JSON or CSV")
+    filters.add_arguments(parser)
+    args = parser.parse_args()
+    if args.verbose:
+        metrics.set_verbose()
+    record_filter = filters.from_args(args)
+
+    # 终端输出时按行刷新，确保输出可见；重定向到文件时使用块缓冲以保证吞吐
+    if sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=True)
+
+    print(CSV_HEADER)
+
+    start = time.perf_counter()
+    count = 0
+    if args.files:
+        jobs = args.jobs or os.cpu_count() or 1
+        for path in args.files:
+            count += write_rows(cached_file_rows(path, jobs, record_filter), sys.stdout)
+    else:
+        with StageMetrics("bib:<stdin>", out=debug_out) as stats:
+            count = write_rows(iter_rows(sys.stdin, stats, record_filter), sys.stdout)
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+
+    # 确认脚本执行完成
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"CSV conversion completed with {count} entries in {elapsed:.2f}s ({rate:,.0f} entries/sec)",
+          file=debug_out)
+    if args.metrics:
+        metrics.write_report(args.metrics)
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+跨检索轮次的持久DOI登记表
+
+登记表是一个SQLite文件，记录之前各轮已经见过的每个DOI：规范化DOI(小写，去掉
+https://doi.org/、dx.doi.org、doi: 等前缀)、标题、首次出现的来源文件和轮次。
+主键是规范化DOI的8字节哈希(与 select_same_doi.doi_key 相同)，新一轮的导出只需按批
+查询本轮出现的键，耗时与新记录数成正比，不必重新合并和比较之前各轮的全部文件。
+
+select_same_doi.py --registry 登记表.sqlite --round 轮次 在合并时使用登记表。
+
+用法: python doi_registry.py [登记表.sqlite] [--lookup DOI ...]
+不带 --lookup 时按轮次和来源统计登记的记录数。
+"""
+
+import sys
+import os
+import time
+import sqlite3
+import argparse
+
+from records import normalize_doi
+from select_same_doi import doi_key
+
+DEFAULT_REGISTRY = "./.doi-registry.sqlite"
+
+# SQLite 对单条语句的参数个数有上限，分批查询
+_CHUNK = 500
+
+
+def canonical_doi(doi):
+    """规范化DOI：去掉各种链接前缀并小写化，空值返回空字符串"""
+    return normalize_doi(doi)
+
+
+def registry_key(doi):
+    """规范化DOI的哈希键，空DOI返回None"""
+    return doi_key(canonical_doi(doi))
+
+
+def _signed(key):
+    # doi_key 是无符号64位整数，SQLite 的整数主键是有符号的
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class DoiRegistry:
+    """SQLite 中的 {DOI键: (规范化DOI, 标题, 首次出现的来源, 轮次, 登记时间)}"""
+
+    def __init__(self, path=DEFAULT_REGISTRY):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS records (key INTEGER PRIMARY KEY, doi TEXT NOT NULL, title TEXT, "
+            "source TEXT, round TEXT NOT NULL, added REAL)")
+
+    def lookup_many(self, keys):
+        """批量查询，返回 {键: (来源, 轮次)}，只包含已登记的键"""
+        found = {}
+        signed = {_signed(key): key for key in keys}
+        params = list(signed)
+        for start in range(0, len(params), _CHUNK):
+            chunk = params[start:start + _CHUNK]
+            query = f"SELECT key, source, round FROM records WHERE key IN ({','.join('?' * len(chunk))})"
+            for key, source, round_name in self.connection.execute(query, chunk):
+                found[signed[key]] = (source, round_name)
+        return found
+
+    def add_many(self, records):
+        """
+        登记 (键, 规范化DOI, 标题, 来源, 轮次) 记录，已登记的键保持首次登记的内容不变
+
+        返回新登记的记录数
+        """
+        now = time.time()
+        before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                ((_signed(key), doi, title, source, round_name, now)
+                 for key, doi, title, source, round_name in records))
+        return self.connection.total_changes - before
+
+    def lookup_doi(self, doi):
+        """按DOI查询一条登记记录，返回字典或None"""
+        key = registry_key(doi)
+        if key is None:
+            return None
+        row = self.connection.execute(
+            "SELECT doi, title, source, round, added FROM records WHERE key = ?", (_signed(key),)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("doi", "title", "source", "round", "added"), row))
+
+    def summary(self):
+        """按轮次和来源统计的 [(轮次, 来源, 记录数, 首次登记时间)]"""
+        return self.connection.execute(
+            "SELECT round, source, COUNT(*), MIN(added) FROM records GROUP BY round, source "
+            "ORDER BY MIN(added), source").fetchall()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看跨检索轮次的DOI登记表")
+    parser.add_argument("registry", nargs="?", default=DEFAULT_REGISTRY, help="登记表文件")
+    parser.add_argument("--lookup", nargs="+", metavar="DOI", help="查询DOI是否已登记")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.registry):
+        print(f"错误: 登记表 {args.registry} 不存在", file=sys.stderr)
+        sys.exit(1)
+    with DoiRegistry(args.registry) as registry:
+        if args.lookup:
+            for doi in args.lookup:
+                record = registry.lookup_doi(doi)
+                if record is None:
+                    print(f"{doi}: 未登记")
+                else:
+                    print(f"{doi}: 轮次 {record['round']}，来源 {record['source']}，标题 {record['title']}")
+            return
+        print(f"{'轮次':<16} {'来源':<32} {'记录数':>8}  登记时间")
+        for round_name, source, count, added in registry.summary():
+            print(f"{round_name:<16} {source:<32} {count:>8}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(added))}")
+        print(f"共 {len(registry)} 个DOI")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+一次性并行处理输入目录中的所有检索导出文件
+
+按扩展名分派到对应的解析器：.csv -> process_csv_file，.txt -> process_txt_file，
+.bib -> convert_bib；每个文件在进程池中独立解析，结果写入输出目录下同名的CSV文件
+(--format parquet 时为列式的Parquet文件，见 columnar.py)。
+输出目录中不是本次运行写出的CSV和Parquet文件(如输入文件改名后留下的旧结果)默认保留；
+指定 --clean 时先列出这些文件再删除，避免之后与新结果一起被合并。
+
+按纳入标准过滤(--min-year、--max-year、--doi-prefix、--venue，见 record_filter.py)时，
+条件在各解析器内部尽早检查，被排除的记录不会被完整解析。
+
+用法: python ingest.py [输入目录] [输出目录] [--jobs N] [--format csv|parquet] [--min-year Y] [--max-year Y]
+                       [--doi-prefix P ...] [--venue V ...] [--clean] [--verbose] [--metrics 报告.json]
+默认读取 ./input，写入 ./spec-csv
+"""
+
+import sys
+import os
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import columnar
+import convert_bib
+import metrics
+import record_filter as filters
+from parse_cache import cached_records
+from specificate_csv import PARSER_VERSION, process_csv_file, process_txt_file, write_csv_output
+
+# 扩展名 -> 解析器类型
+PARSERS = {
+    ".csv": "csv",
+    ".txt": "txt",
+    ".bib": "bib",
+}
+
+
+def find_input_files(input_dir):
+    """找出输入目录中所有可解析的文件，按大小降序排列以便进程池负载均衡"""
+    files = [path for path in glob.glob(os.path.join(input_dir, '*'))
+             if os.path.isfile(path) and os.path.splitext(path)[1].lower() in PARSERS]
+    return sorted(files, key=os.path.getsize, reverse=True)
+
+
+def output_path_for(input_path, output_dir, extension=".csv"):
+    """输出文件名与输入文件同名(小写)，扩展名默认为 .csv"""
+    stem = os.path.splitext(os.path.basename(input_path))[0].lower()
+    return os.path.join(output_dir, f"{stem}{extension}")
+
+
+def find_stale_outputs(output_dir, written):
+    """输出目录中不在 written 里的CSV和Parquet文件"""
+    written = {os.path.abspath(path) for path in written}
+    return [path for path in sorted(glob.glob(os.path.join(output_dir, '*')))
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in (".csv", columnar.PARQUET_EXTENSION)
+            and os.path.abspath(path) not in written]
+
+
+def ingest_file(input_path, output_path, record_filter=None):
+    """
+    在工作进程中解析单个文件并写出，返回(输入文件, 输出文件, 记录数)
+
+    解析结果经过内容寻址的缓存，重新运行时只有新增或修改过的文件会被真正解析；
+    record_filter 为 RecordFilter 时只写出满足条件的记录，过滤条件是缓存键的一部分
+    """
+    parser = PARSERS[os.path.splitext(input_path)[1].lower()]
+    if parser == "bib":
+        count = convert_bib.convert_file(input_path, output_path, record_filter=record_filter)
+    else:
+        parse = process_csv_file if parser == "csv" else process_txt_file
+        tag = record_filter.cache_tag() if record_filter is not None else ""
+        entries = list(cached_records(input_path, parser + tag, PARSER_VERSION,
+                                      lambda path: parse(path, record_filter)))
+        # 过滤后没有记录时同样写出只有表头的文件，不留下之前的结果
+        count = len(entries) if write_csv_output(entries, output_path) else 0
+    return input_path, output_path, count
+
+
+def _ingest_file_with_metrics(input_path, output_path, record_filter=None):
+    """进程池任务：ingest_file 的结果加上本文件记录的运行指标"""
+    # 工作进程会被复用，先丢弃之前遗留的指标
+    metrics.drain()
+    return ingest_file(input_path, output_path, record_filter) + (metrics.drain(),)
+
+
+def ingest(input_dir='./input', output_dir='./spec-csv', jobs=None, metrics_output=None, extension=".csv",
+           record_filter=None, clean=False):
+    """
+    并行处理输入目录中的所有文件，返回 {输入文件: 记录数}
+
+    metrics_output 不为None时把各工作进程带回的运行指标保存为JSON或CSV；
+    extension 为 .parquet 时输出Parquet文件；record_filter 为 RecordFilter 时只保留满足条件的记录。
+    输出目录中不是本次写出的CSV和Parquet文件只列出，clean 为True时列出后删除
+    """
+    files = find_input_files(input_dir)
+    if not files:
+        print(f"在{input_dir}目录下没有找到可处理的文件", file=sys.stderr)
+        return {}
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    counts = {}
+    outputs = []
+    stages = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as pool:
+        futures = [pool.submit(_ingest_file_with_metrics, path, output_path_for(path, output_dir, extension), record_filter)
+                   for path in files]
+        for future in as_completed(futures):
+            input_path, output_path, count, file_metrics = future.result()
+            counts[input_path] = count
+            stages.extend(file_metrics)
+            outputs.append(output_path)
+            print(f"{input_path} -> {output_path}: {count} 条记录", file=sys.stderr)
+    stale = find_stale_outputs(output_dir, outputs)
+    if stale and clean:
+        print(f"删除{output_dir}中不是本次写出的 {len(stale)} 个文件: {', '.join(stale)}", file=sys.stderr)
+        for path in stale:
+            os.remove(path)
+    elif stale:
+        print(f"{output_dir}中还有 {len(stale)} 个不是本次写出的文件(未删除，--clean 时删除): {', '.join(stale)}",
+              file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    total = sum(counts.values())
+    print(f"共处理 {len(files)} 个文件，{total} 条记录，用时 {elapsed:.2f}s", file=sys.stderr)
+    if metrics_output:
+        metrics.write_report(metrics_output, stages)
+        print(f"运行指标已保存至 {metrics_output}", file=sys.stderr)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并行处理输入目录中的所有检索导出文件")
+    parser.add_argument("input_dir", nargs="?", default="./input", help="输入目录")
+    parser.add_argument("output_dir", nargs="?", default="./spec-csv", help="输出目录")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数，默认使用全部CPU核")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv", help="输出文件的格式")
+    parser.add_argument("--clean", action="store_true", help="删除输出目录中不是本次写出的CSV和Parquet文件")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出逐条的调试信息和全部警告")
+    parser.add_argument("--metrics", default=None, help="将运行指标保存为JSON或CSV")
+    filters.add_arguments(parser)
+    args = parser.parse_args()
+    if args.verbose:
+        metrics.set_verbose()
+
+    if not ingest(args.input_dir, args.output_dir, args.jobs, args.metrics, "." + args.format,
+                  filters.from_args(args), args.clean):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+
+"""
+用大语言模型按标题初筛论文(对应 checking-flow/screening-GPT-4o.csv 阶段)
+
+每个请求携带一批标题，请求之间用 asyncio 并发(受并发上限限制)，失败的请求按指数退避重试。
+每个标题的判断结果以 "提示词版本 + 模型 + 归一化标题" 的哈希为键缓存在 SQLite 文件中，
+重新运行时只请求新的标题；修改提示词时递增 PROMPT_VERSION 使旧的判断失效。
+输出文件与输入文件的列相同，只包含被判断为纳入的论文。
+
+接口兼容 OpenAI 的 /chat/completions，可用 --base-url 指向其他兼容服务或本地的替身服务:
+    python llm_screening.py --stub-server 8000
+    python llm_screening.py input.csv output.csv --base-url http://127.0.0.1:8000/v1
+
+用法: python llm_screening.py [输入文件] [输出文件] [--model M] [--batch-size N] [--concurrency N]
+API密钥从环境变量 OPENAI_API_KEY 读取。
+"""
+
+import sys
+import os
+import csv
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+import urllib.error
+import urllib.request
+
+from keyword_matcher import normalize_text
+from search_index import write_records
+
+# 修改提示词或输出格式时递增，使缓存的旧判断失效
+PROMPT_VERSION = 2
+
+DEFAULT_BASE_URL = os.environ.get("LLM_BASE_URL", "https://api.openai.com/v1")
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_CACHE = "./.llm-screening-cache.sqlite"
+
+SYSTEM_PROMPT = (
+    "You are screening papers for a systematic review on deep learning methods for "
+    "spectral super-resolution, reconstruction and analysis of astronomical and other spectra. "
+    "For each numbered title decide whether the paper is likely relevant and should be kept "
+    "for full-text review. Answer only with JSON of the form "
+    '{"decisions": [{"id": 1, "include": true}, ...]} containing every id exactly once.'
+)
+
+# 可以重试的HTTP状态码
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class FatalRequestError(Exception):
+    """重试也无法成功的错误(认证失败、请求格式错误等)，终止整个运行"""
+
+
+def title_key(title, model):
+    """缓存键 = 提示词版本 + 模型 + 归一化标题的哈希"""
+    payload = f"{PROMPT_VERSION}\x1f{model}\x1f{normalize_text(title)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DecisionCache:
+    """SQLite 中的 {键: 是否纳入}，只在事件循环所在的线程中访问"""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, include INTEGER NOT NULL, created REAL)")
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        # SQLite 对单条语句的参数个数有上限，分批查询
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            query = f"SELECT key, include FROM decisions WHERE key IN ({','.join('?' * len(chunk))})"
+            found.update((key, bool(include)) for key, include in self.connection.execute(query, chunk))
+        return found
+
+    def put_many(self, decisions):
+        now = time.time()
+        self.connection.executemany("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)",
+                                    [(key, int(include), now) for key, include in decisions.items()])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def _single_line(title):
+    """标题中的换行和回车替换为空格，保证一个标题只占编号后的一行"""
+    return " ".join((title or "").splitlines())
+
+
+def build_messages(titles):
+    numbered = "\n".join(f"{i}. {_single_line(title)}" for i, title in enumerate(titles, 1))
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": numbered},
+    ]
+
+
+def parse_decisions(content, count):
+    """解析模型的回答，返回与标题顺序一致的布尔列表；格式不符时抛出 ValueError"""
+    data = json.loads(content)
+    decisions = {}
+    for item in data.get("decisions", []):
+        decisions[int(item["id"])] = bool(item["include"])
+    missing = [i for i in range(1, count + 1) if i not in decisions]
+    if missing:
+        raise ValueError(f"回答中缺少 {len(missing)} 个标题的判断")
+    return [decisions[i] for i in range(1, count + 1)]
+
+
+class ScreeningClient:
+    """
+    批量、并发、带重试的筛选客户端
+
+    HTTP请求用 urllib 在线程池中执行(asyncio.to_thread)，并发数由信号量限制；
+    信号量在第一次请求时于当前事件循环中创建。
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, model=DEFAULT_MODEL, api_key=None,
+                 concurrency=8, max_retries=5, timeout=120):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self._semaphore = None
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.requests = 0
+        self.retries = 0
+
+    def _post(self, payload):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'), headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    async def classify(self, titles):
+        """判断一批标题，返回布尔列表"""
+        payload = {
+            "model": self.model,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": build_messages(titles),
+        }
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    self.requests += 1
+                    response = await asyncio.to_thread(self._post, payload)
+                    content = response["choices"][0]["message"]["content"]
+                    return parse_decisions(content, len(titles))
+                except urllib.error.HTTPError as e:
+                    if e.code not in RETRY_STATUS:
+                        raise FatalRequestError(f"HTTP {e.code}: {e.read()[:200].decode('utf-8', 'replace')}")
+                    retry_after = e.headers.get("Retry-After")
+                    error = f"HTTP {e.code}"
+                except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+                    error = str(e)
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    # 回答不是要求的JSON格式
+                    error = f"无法解析回答: {e}"
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"重试 {self.max_retries} 次后仍然失败: {error}")
+                self.retries += 1
+                delay = min(2 ** attempt, 60) * random.uniform(0.5, 1.0)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                print(f"请求失败({error})，{delay:.1f}s 后重试", file=sys.stderr)
+                await asyncio.sleep(delay)
+
+
+async def screen_titles(titles, client, cache, batch_size=20):
+    """
+    判断一组标题，返回 {缓存键: 是否纳入}
+
+    归一化后相同的标题只判断一次；已缓存的标题不再请求。每批完成后立即写入缓存，中断后已完成的批次不会重复请求。
+    失败的批次不写入缓存，对应的标题不出现在返回结果中。
+    """
+    keys = {}
+    for title in titles:
+        keys.setdefault(title_key(title, client.model), title)
+    decisions = cache.get_many(keys)
+    pending = [(key, title) for key, title in keys.items() if key not in decisions]
+    print(f"{len(keys)} 个不同标题，缓存命中 {len(decisions)} 个，需要请求 {len(pending)} 个", file=sys.stderr)
+
+    async def run_batch(batch):
+        try:
+            results = await client.classify([title for _, title in batch])
+        except RuntimeError as e:
+            print(f"{len(batch)} 个标题未能判断: {e}", file=sys.stderr)
+            return
+        batch_decisions = {key: include for (key, _), include in zip(batch, results)}
+        cache.put_many(batch_decisions)
+        decisions.update(batch_decisions)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    tasks = [asyncio.ensure_future(run_batch(batch)) for batch in batches]
+    try:
+        await asyncio.gather(*tasks)
+    except FatalRequestError:
+        for task in tasks:
+            task.cancel()
+        raise
+    return decisions
+
+
+def screen_file(input_file, output_file, client, cache, batch_size=20):
+    """筛选 input_file 中的论文，写出判断为纳入的行，返回(纳入数, 未能判断数)"""
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        titles = [row.get('Title') or "" for row in csv.DictReader(f)]
+
+    decisions = asyncio.run(screen_titles([t for t in titles if t.strip()], client, cache, batch_size))
+    included = []
+    undecided = 0
+    for i, title in enumerate(titles):
+        if not title.strip():
+            continue
+        decision = decisions.get(title_key(title, client.model))
+        if decision is None:
+            undecided += 1
+        elif decision:
+            included.append(i)
+    write_records(input_file, included, output_file)
+    return len(included), undecided
+
+
+def run_stub_server(port):
+    """
+    本地替身服务：实现 /chat/completions，用 check.py 的关键词判断每个标题
+
+    用于在不访问真实API的情况下测试批处理、并发和缓存；设置环境变量
+    STUB_FAILURE_RATE(0~1) 可以随机返回503以测试重试。
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from keyword_matcher import KeywordMatcher
+    from check import Check_Keywords
+
+    matcher = KeywordMatcher(Check_Keywords)
+    failure_rate = float(os.environ.get("STUB_FAILURE_RATE", "0"))
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if random.random() < failure_rate:
+                self.send_error(503)
+                return
+            lines = body["messages"][-1]["content"].splitlines()
+            decisions = []
+            for line in lines:
+                number, _, title = line.partition(". ")
+                if not number.isdigit():
+                    continue
+                decisions.append({"id": int(number), "include": matcher.matches_any(title)})
+            content = json.dumps({"decisions": decisions})
+            payload = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"替身服务已启动: http://127.0.0.1:{port}/v1", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用大语言模型按标题初筛论文")
+    parser.add_argument("input_file", nargs="?", default="./result/Initial_Record_List.csv", help="待筛选的CSV文件")
+    parser.add_argument("output_file", nargs="?", default="./result/screening-GPT-4o.csv", help="筛选结果的输出文件")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="兼容OpenAI接口的服务地址")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="模型名称")
+    parser.add_argument("--batch-size", type=int, default=20, help="每个请求携带的标题数")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的请求数上限")
+    parser.add_argument("--max-retries", type=int, default=5, help="每个请求的最大重试次数")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="判断结果缓存(SQLite文件)")
+    parser.add_argument("--stub-server", type=int, metavar="PORT", help="只启动本地替身服务")
+    args = parser.parse_args()
+
+    if args.stub_server:
+        run_stub_server(args.stub_server)
+        return
+
+    client = ScreeningClient(args.base_url, args.model, os.environ.get("OPENAI_API_KEY"),
+                             args.concurrency, args.max_retries)
+    cache = DecisionCache(args.cache)
+    start = time.perf_counter()
+    try:
+        included, undecided = screen_file(args.input_file, args.output_file, client, cache, args.batch_size)
+    except FatalRequestError as e:
+        print(f"请求失败，已终止: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        cache.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"筛选完成。找到 {included} 篇纳入的论文，用时 {elapsed:.1f}s"
+          f"(请求 {client.requests} 次，重试 {client.retries} 次)。")
+    print(f"结果已保存至 {args.output_file}")
+    if undecided:
+        print(f"警告: {undecided} 篇论文未能得到判断，重新运行将只请求这些论文", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+"""
+各预处理阶段共用的运行指标
+
+每个阶段用一个 StageMetrics 统计解析、按原因分类的跳过、重复等计数，并记录耗时、
+每秒记录数和峰值内存。逐条的警告只输出每种原因的前几条样例，其余只计数；
+需要逐条排查时用 --verbose(或环境变量 PREPROCESS_VERBOSE=1)打开详细输出。
+完成的阶段登记在本进程的报告中，可用 write_report 保存为JSON或CSV。
+
+用法: python metrics.py 报告.json [...]   合并显示一个或多个运行报告
+"""
+
+import sys
+import os
+import csv
+import json
+import time
+from collections import Counter
+
+# 打开后输出逐条的跟踪信息和全部警告
+VERBOSE = os.environ.get("PREPROCESS_VERBOSE", "") not in ("", "0")
+
+# 每种警告原因默认只输出的样例条数
+SAMPLE_LIMIT = 5
+
+# 本进程中已完成阶段的指标
+_completed = []
+
+
+def set_verbose(verbose=True):
+    """打开或关闭详细输出，同时设置环境变量使之后启动的工作进程继承该设置"""
+    global VERBOSE
+    VERBOSE = verbose
+    os.environ["PREPROCESS_VERBOSE"] = "1" if verbose else "0"
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存(MB)，不支持 resource 模块的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB为单位，macOS 以字节为单位
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+class StageMetrics:
+    """
+    一个阶段的计数器、耗时和采样警告
+
+    可作为上下文管理器使用，退出时自动调用 finish。
+    """
+
+    def __init__(self, stage, out=None, sample_limit=SAMPLE_LIMIT):
+        self.stage = stage
+        self.out = out
+        self.sample_limit = sample_limit
+        self.counters = Counter()
+        # 通过 warn 计数的原因，结束时汇总被截断的部分
+        self.warned = set()
+        self.records = 0
+        self.start = time.perf_counter()
+        self.elapsed = None
+        self.peak_rss_mb = None
+
+    def _stream(self):
+        return self.out if self.out is not None else sys.stderr
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def record(self, n=1):
+        """记录成功处理(产出)的记录数"""
+        self.records += n
+
+    def warn(self, reason, message):
+        """按原因计数；每种原因只输出前 sample_limit 条，详细模式下全部输出"""
+        self.counters[reason] += 1
+        self.warned.add(reason)
+        if VERBOSE or self.counters[reason] <= self.sample_limit:
+            print(f"[{self.stage}] {message}", file=self._stream())
+
+    def skip(self, reason, message):
+        """记录一条被跳过的记录，计数器名为 skipped.<原因>"""
+        self.warn(f"skipped.{reason}", message)
+
+    def trace(self, message):
+        """只在详细模式下输出"""
+        if VERBOSE:
+            print(f"[{self.stage}] {message}", file=self._stream())
+
+    def finish(self):
+        """结束计时并登记到本进程的报告中，重复调用无效"""
+        if self.elapsed is not None:
+            return self
+        self.elapsed = time.perf_counter() - self.start
+        self.peak_rss_mb = peak_rss_mb()
+        _completed.append(self)
+        # 被截断的警告汇总为一行
+        if not VERBOSE:
+            for reason, n in sorted(self.counters.items()):
+                if n > self.sample_limit and reason in self.warned:
+                    print(f"[{self.stage}] {reason}: 共 {n} 条，仅显示了前 {self.sample_limit} 条", file=self._stream())
+        return self
+
+    def as_dict(self):
+        rate = self.records / self.elapsed if self.elapsed else None
+        return {
+            "stage": self.stage,
+            "records": self.records,
+            "elapsed_s": round(self.elapsed, 4) if self.elapsed is not None else None,
+            "records_per_sec": round(rate, 1) if rate is not None else None,
+            "peak_rss_mb": round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def summary(self):
+        """单行摘要"""
+        data = self.as_dict()
+        parts = [f"{data['records']} 条记录", f"{data['elapsed_s']:.2f}s"]
+        if data["records_per_sec"]:
+            parts.append(f"{data['records_per_sec']:,.0f} 条/秒")
+        parts.extend(f"{name}={n}" for name, n in data["counters"].items())
+        return f"[{self.stage}] " + "，".join(parts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish()
+        return False
+
+
+def completed():
+    """本进程中已完成阶段的指标(字典形式)"""
+    return [m.as_dict() for m in _completed]
+
+
+def drain():
+    """取出并清空本进程中已完成阶段的指标，用于从工作进程把指标带回主进程"""
+    result = completed()
+    _completed.clear()
+    return result
+
+
+def write_report(path, stages=None):
+    """
+    保存运行报告，扩展名为 .csv 时每个阶段一行(计数器展开为列)，否则为JSON
+
+    stages 为指标字典列表，为None时使用本进程中已完成的阶段
+    """
+    stages = completed() if stages is None else stages
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.lower().endswith(".csv"):
+        counter_names = sorted({name for s in stages for name in s["counters"]})
+        fieldnames = ["stage", "records", "elapsed_s", "records_per_sec", "peak_rss_mb"] + counter_names
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n')
+            writer.writeheader()
+            for s in stages:
+                row = {k: v for k, v in s.items() if k != "counters"}
+                row.update(s["counters"])
+                writer.writerow(row)
+    else:
+        report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": stages}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("用法: python metrics.py 报告.json [...]", file=sys.stderr)
+        sys.exit(1)
+    print(f"{'阶段':<32} {'记录数':>10} {'耗时(s)':>9} {'记录/秒':>10} {'峰值内存(MB)':>12}  计数")
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            stages = json.load(f)["stages"]
+        for s in stages:
+            counters = ", ".join(f"{k}={v}" for k, v in s["counters"].items())
+            rate = f"{s['records_per_sec']:,.0f}" if s["records_per_sec"] else "-"
+            rss = f"{s['peak_rss_mb']:.1f}" if s["peak_rss_mb"] is not None else "-"
+            print(f"{s['stage']:<32} {s['records']:>10} {s['elapsed_s']:>9.2f} {rate:>10} {rss:>12}  {counters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""
+近似重复检测：对DOI去重后的记录按归一化标题做字符 shingle + MinHash/LSH 分桶，
+找出DOI为空、DOI不同(如arXiv DOI)或标题略有差异的疑似重复记录
+
+用法: python near_duplicate.py [输入文件] [输出文件]
+默认读取 ./result/output.csv，结果写入 ./result/near_duplicates.csv
+"""
+
+import sys
+import csv
+import re
+import zlib
+import unicodedata
+
+import numpy as np
+
+import columnar
+from metrics import StageMetrics
+
+# 签名长度 = 分带数 × 每带行数；分带越多召回越高
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+# 字符 shingle 长度
+SHINGLE_SIZE = 5
+
+# 估计的Jaccard相似度达到该阈值才认为是疑似重复
+DEFAULT_THRESHOLD = 0.7
+
+# 每批计算签名的记录数，控制临时数组大小
+BATCH_SIZE = 10000
+
+# 每次同时计算的置换数，临时数组为 PERM_BLOCK × 一批的 shingle 总数
+PERM_BLOCK = 8
+
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+_LATEX_RE = re.compile(r'\\[a-zA-Z]+|[{}$\\]')
+
+# multiply-shift 哈希族的参数，固定种子保证多次运行结果一致
+_rng = np.random.default_rng(4450)
+_PERM_A = (_rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)).reshape(-1, 1)
+_PERM_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64).reshape(-1, 1)
+_EMPTY_SIGNATURE = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def normalize_title(title):
+    """去掉LaTeX命令、重音和标点，只保留小写字母数字和单个空格"""
+    if not isinstance(title, str):
+        return ""
+    title = _LATEX_RE.sub(' ', title)
+    title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('ascii')
+    return _NON_ALNUM_RE.sub(' ', title.lower()).strip()
+
+
+_LATEX_COMMAND_RE = re.compile(r'\\[a-zA-Z]+')
+_MULTI_SPACE_RE = re.compile(rb'  +')
+
+# ASCII字节 -> 小写字母数字原样(大写转小写)，换行符保留作分隔，其余都变为空格
+_ASCII_TITLE_TABLE = bytes(
+    c + 32 if 65 <= c <= 90 else c if 48 <= c <= 57 or 97 <= c <= 122 or c == 10 else 32
+    for c in range(256)
+)
+
+
+def normalize_titles(titles):
+    """
+    批量版本的 normalize_title，结果逐条相同
+
+    所有标题以换行符拼接后一次性完成：LaTeX命令用正则去掉，其余的符号(包括 {}$\\)、大小写
+    和标点在去掉重音后按字节查表替换，最后合并连续空格再切开。
+    """
+    if not titles:
+        return []
+    text = "\n".join(t.replace("\n", " ").replace("\r", " ") if isinstance(t, str) else "" for t in titles)
+    text = _LATEX_COMMAND_RE.sub(' ', text)
+    data = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').translate(_ASCII_TITLE_TABLE)
+    lines = _MULTI_SPACE_RE.sub(b' ', data).decode('ascii').split("\n")
+    return [line.strip() for line in lines]
+
+
+def shingle_hashes(normalized):
+    """归一化标题的字符 shingle 的32位哈希集合(去掉空格后切分，对断词差异不敏感)"""
+    text = normalized.replace(' ', '')
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode())} if text else set()
+    data = text.encode()
+    return {zlib.crc32(data[i:i + SHINGLE_SIZE]) for i in range(len(data) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signatures(hash_sets):
+    """
+    批量计算MinHash签名，返回 (记录数, NUM_PERM) 的uint32数组
+
+    一批记录的所有 shingle 哈希拼接为一个数组，每次计算 PERM_BLOCK 个置换后用
+    minimum.reduceat 按记录取最小值，避免逐记录的Python循环，临时数组的大小也有上限。
+    """
+    signatures = np.empty((len(hash_sets), NUM_PERM), dtype=np.uint32)
+    lengths = np.fromiter((len(s) for s in hash_sets), dtype=np.int64, count=len(hash_sets))
+    nonempty = lengths > 0
+    signatures[~nonempty] = _EMPTY_SIGNATURE
+    if not nonempty.any():
+        return signatures
+
+    flat = np.fromiter((h for s in hash_sets for h in s), dtype=np.uint64, count=int(lengths.sum()))
+    offsets = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+    minima = np.empty((int(nonempty.sum()), NUM_PERM), dtype=np.uint32)
+    for start in range(0, NUM_PERM, PERM_BLOCK):
+        stop = start + PERM_BLOCK
+        # (a*x + b) mod 2^64 的高32位
+        permuted = ((_PERM_A[start:stop] * flat + _PERM_B[start:stop]) >> np.uint64(32)).astype(np.uint32)
+        minima[:, start:stop] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    signatures[nonempty] = minima
+    return signatures
+
+
+class _UnionFind:
+    """记录编号上的并查集"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent.get(x, x)
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 较小编号作为根，簇代表为最早出现的记录
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+
+def find_near_duplicates(titles, threshold=DEFAULT_THRESHOLD):
+    """
+    在标题列表中查找疑似重复的簇
+
+    每个LSH桶只保存第一条记录，后续落入同一桶的记录只与它比较，
+    因此比较次数与记录数成线性关系，不做 O(n²) 的两两比较。
+
+    返回 [(簇代表编号, [(记录编号, 与代表的相似度), ...]), ...]，只包含大小不少于2的簇
+    """
+    n = len(titles)
+    signatures = np.empty((n, NUM_PERM), dtype=np.uint32)
+    empty = np.zeros(n, dtype=bool)
+    for start in range(0, n, BATCH_SIZE):
+        hash_sets = [shingle_hashes(t) for t in normalize_titles(titles[start:start + BATCH_SIZE])]
+        empty[start:start + len(hash_sets)] = [not s for s in hash_sets]
+        signatures[start:start + len(hash_sets)] = minhash_signatures(hash_sets)
+
+    uf = _UnionFind()
+    for band in range(NUM_BANDS):
+        columns = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        # 每带的若干行拼成一个字节串作为桶键
+        keys = np.ascontiguousarray(columns).view(f'V{4 * ROWS_PER_BAND}').ravel()
+        buckets = {}
+        for i, key in enumerate(keys.tolist()):
+            if empty[i]:
+                continue
+            first = buckets.setdefault(key, i)
+            if first == i or uf.find(first) == uf.find(i):
+                continue
+            if np.count_nonzero(signatures[first] == signatures[i]) / NUM_PERM >= threshold:
+                uf.union(first, i)
+
+    clusters = {}
+    for i in list(uf.parent):
+        clusters.setdefault(uf.find(i), []).append(i)
+
+    result = []
+    for root in sorted(clusters):
+        members = sorted(set(clusters[root]) | {root})
+        if len(members) < 2:
+            continue
+        scored = [(i, float(np.count_nonzero(signatures[root] == signatures[i])) / NUM_PERM)
+                  for i in members]
+        result.append((root, scored))
+    return result
+
+
+def write_clusters(rows, clusters, fieldnames, output_file):
+    """写出疑似重复簇：每行一条记录，附簇编号和与簇代表的相似度"""
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['Cluster', 'Similarity'] + fieldnames)
+        for cluster_id, (_, members) in enumerate(clusters, 1):
+            for i, similarity in members:
+                writer.writerow([cluster_id, f"{similarity:.3f}"] + [rows[i].get(c, '') for c in fieldnames])
+
+
+def detect_near_duplicates(input_file='./result/output.csv', output_file='./result/near_duplicates.csv',
+                           threshold=DEFAULT_THRESHOLD):
+    """读取DOI去重后的结果，写出疑似重复簇"""
+    stats = StageMetrics("near_duplicate")
+    if columnar.is_columnar(input_file):
+        fieldnames = columnar.read_headers(input_file)
+        rows = list(columnar.iter_dict_rows(input_file))
+    else:
+        with open(input_file, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            fieldnames = reader.fieldnames or []
+            rows = list(reader)
+
+    clusters = find_near_duplicates([row.get('Title', '') for row in rows], threshold)
+    write_clusters(rows, clusters, fieldnames, output_file)
+
+    records = sum(len(members) for _, members in clusters)
+    stats.record(len(rows))
+    stats.count("clusters", len(clusters))
+    stats.count("clustered_records", records)
+    stats.finish()
+    print(f"发现{len(clusters)}个疑似重复簇，共{records}条记录，已保存到{output_file}")
+    return clusters
+
+
+if __name__ == "__main__":
+    detect_near_duplicates(*sys.argv[1:3])
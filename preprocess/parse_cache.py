@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+"""
+以输入文件内容哈希和解析器版本为键的解析结果缓存
+
+解析结果按批用pickle顺序写入缓存文件，读取时逐批加载，写入和读取都不需要一次性持有全部记录。
+缓存目录超出大小上限或文件过期时按最近使用时间淘汰。
+
+用法: python parse_cache.py [clear|info]
+"""
+
+import sys
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+
+# 默认缓存目录(相对于运行目录)，可用环境变量 PARSE_CACHE_DIR 覆盖
+DEFAULT_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", "./.parse-cache")
+
+# 缓存总大小上限和单个缓存文件的最长保留时间
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+# 每批写入的记录数
+BATCH_SIZE = 10000
+
+# 设置 PREPROCESS_NO_CACHE=1 可完全关闭缓存
+CACHE_DISABLED = os.environ.get("PREPROCESS_NO_CACHE", "") not in ("", "0")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """计算文件内容的sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """目录形式的解析结果缓存，每个键对应一个 .pkl 文件"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def key(self, path, parser, version):
+        """缓存键 = 解析器名 + 版本 + 文件内容哈希"""
+        return f"{parser}-v{version}-{file_digest(path)}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pkl")
+
+    def contains(self, key):
+        return os.path.exists(self._path(key))
+
+    def load(self, key):
+        """逐条产出缓存的记录，并刷新该缓存文件的使用时间"""
+        path = self._path(key)
+        os.utime(path)
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    batch = pickle.load(f)
+                except EOFError:
+                    return
+                yield from batch
+
+    def store_iter(self, key, records):
+        """
+        边产出记录边写入缓存
+
+        写入临时文件，全部记录产出完毕后才原子地改名为正式缓存文件，
+        中途中断不会留下不完整的缓存。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                batch = []
+                for record in records:
+                    batch.append(record)
+                    if len(batch) >= BATCH_SIZE:
+                        pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                        batch = []
+                    yield record
+                if batch:
+                    pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def entries(self):
+        """返回 [(路径, 大小, 最近使用时间), ...]"""
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            result.append((path, stat.st_size, stat.st_mtime))
+        return result
+
+    def evict(self):
+        """删除过期的缓存，并按最近使用时间从旧到新删除直到总大小不超过上限"""
+        now = time.time()
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, mtime in entries:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+
+def cached_records(path, parser, version, parse, cache=None):
+    """
+    通过缓存获取 parse(path) 的结果，返回记录的迭代器
+
+    参数:
+    path -- 输入文件
+    parser -- 解析器名称，与版本一起构成缓存键的一部分
+    version -- 解析器版本，解析逻辑改变时递增以使旧缓存失效
+    parse -- 解析函数，接收文件路径，返回记录的可迭代对象
+    cache -- ParseCache 实例，为None时使用默认缓存目录
+    """
+    if CACHE_DISABLED or not os.path.isfile(path):
+        return iter(parse(path))
+    cache = cache or ParseCache()
+    key = cache.key(path, parser, version)
+    if cache.contains(key):
+        return cache.load(key)
+    return cache.store_iter(key, parse(path))
+
+
+def main():
+    cache = ParseCache()
+    command = sys.argv[1] if len(sys.argv) > 1 else "info"
+    if command == "clear":
+        cache.clear()
+        print(f"已清空缓存目录 {cache.directory}")
+    elif command == "info":
+        entries = cache.entries()
+        total = sum(size for _, size, _ in entries)
+        print(f"缓存目录 {cache.directory}: {len(entries)} 个文件，共 {total / 1024 ** 2:.1f} MB")
+    else:
+        print("用法: python parse_cache.py [clear|info]", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+"""
+增量式PRISMA预处理流水线
+
+各阶段声明为有向无环图：
+    input/* --ingest--> spec-csv/*.csv --merge--> result/output.csv --combine--> result/combined_paper.csv
+                                                          |                              |
+                                                   near_duplicate                     screen --> result/Screening.csv
+
+每个阶段的指纹由参数和全部输入文件的内容哈希组成，只有指纹改变或输出缺失的阶段才会重新运行；
+上游重新运行但输出内容不变时，下游仍然跳过。互不依赖的阶段在进程池中并行执行。
+--columnar 时 spec-csv 下的解析结果和 result/output 保存为Parquet(见 columnar.py)，
+combine 阶段把合并结果转换回 combined_paper.csv 供人工查看和筛选。
+merge 阶段只合并本次解析阶段写出的文件，spec-csv 中的其他文件需要用 --merge-extra 显式指定。
+
+用法: python pipeline.py [--jobs N] [--force] [--dry-run] [--columnar] [--verbose] [--metrics 报告.json]
+                         [--merge-extra 文件 ...] [--min-year Y] [--max-year Y] [--doi-prefix P ...] [--venue V ...]
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import columnar
+import metrics
+import record_filter as filters
+from parse_cache import file_digest
+
+# 流水线状态文件，记录每个阶段上次运行时的指纹和输入文件哈希
+DEFAULT_STATE_FILE = "./result/.pipeline-state.json"
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+
+    参数:
+    name -- 阶段名称
+    func -- 执行函数(必须是模块级函数，以便在子进程中运行)
+    inputs -- 输入文件列表
+    outputs -- 输出文件列表
+    params -- 传给 func 的关键字参数，同时参与指纹计算
+    deps -- 依赖的阶段名称
+    version -- 阶段实现的版本(如解析器版本)，只参与指纹计算
+    """
+
+    def __init__(self, name, func, inputs, outputs, params=None, deps=(), version=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.deps = list(deps)
+        self.version = version
+
+
+class FileHasher:
+    """带缓存的文件内容哈希：大小和修改时间都未变的文件直接沿用上次的哈希"""
+
+    def __init__(self, known=None):
+        self.known = known or {}
+
+    def digest(self, path):
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.known.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = file_digest(path)
+        self.known[path] = [signature, digest]
+        return digest
+
+
+def stage_fingerprint(stage, hasher):
+    """阶段指纹 = 阶段名 + 版本 + 参数 + 每个输入文件的内容哈希"""
+    payload = {
+        "name": stage.name,
+        "version": stage.version,
+        "params": stage.params,
+        "inputs": {path: hasher.digest(path) for path in stage.inputs},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def topological_order(stages):
+    """按依赖关系排序，检查未知依赖和环"""
+    by_name = {stage.name: stage for stage in stages}
+    order = []
+    visiting = set()
+    done = set()
+
+    def visit(name, chain):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"流水线存在循环依赖: {' -> '.join(chain + [name])}")
+        if name not in by_name:
+            raise ValueError(f"未知的依赖阶段: {name}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep, chain + [name])
+        visiting.discard(name)
+        done.add(name)
+        order.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name, [])
+    return order
+
+
+def run_stage(func, params):
+    """在工作进程中执行阶段函数，返回(耗时, 阶段函数记录的运行指标)"""
+    # 工作进程会被复用，先丢弃上一个阶段遗留的指标
+    metrics.drain()
+    start = time.perf_counter()
+    func(**params)
+    return time.perf_counter() - start, metrics.drain()
+
+
+def run_pipeline(stages, jobs=None, force=False, dry_run=False, state_file=DEFAULT_STATE_FILE,
+                 metrics_output=None):
+    """
+    运行流水线，返回 {阶段名: "run" | "skip" | "failed" | "blocked"}
+
+    一个阶段在其全部依赖完成后才计算指纹，因此上游输出没有实际变化时下游会被跳过。
+    metrics_output 不为None时把本次运行的各阶段指标保存为JSON或CSV。
+    """
+    order = topological_order(stages)
+    state = load_state(state_file)
+    hasher = FileHasher(state.get("files"))
+    status = {}
+    pending = {stage.name: stage for stage in order}
+    running = {}
+    collected = []
+
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while pending or running:
+            # 依赖全部完成的阶段：判断是否需要运行，需要则提交到进程池
+            for name, stage in list(pending.items()):
+                dep_status = [status.get(dep) for dep in stage.deps]
+                if any(s in ("failed", "blocked") for s in dep_status):
+                    status[name] = "blocked"
+                    del pending[name]
+                    print(f"[阻塞] {name}: 上游阶段失败", file=sys.stderr)
+                    continue
+                if not all(s in ("run", "skip") for s in dep_status):
+                    continue
+                del pending[name]
+
+                fingerprint = stage_fingerprint(stage, hasher)
+                previous = state["stages"].get(name, {})
+                outputs_ok = all(os.path.exists(path) for path in stage.outputs)
+                if not force and outputs_ok and previous.get("fingerprint") == fingerprint:
+                    status[name] = "skip"
+                    print(f"[跳过] {name}: 输入和参数均未改变", file=sys.stderr)
+                    continue
+                if dry_run:
+                    status[name] = "run"
+                    print(f"[待运行] {name}", file=sys.stderr)
+                    continue
+
+                for path in stage.outputs:
+                    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                print(f"[运行] {name}", file=sys.stderr)
+                future = pool.submit(run_stage, stage.func, stage.params)
+                running[future] = (stage, fingerprint)
+
+            if not running:
+                # 阶段按拓扑顺序处理，没有运行中的阶段时不应还有待处理的阶段
+                if pending:
+                    raise RuntimeError(f"流水线无法继续调度: {', '.join(pending)}")
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint = running.pop(future)
+                try:
+                    elapsed, stage_metrics = future.result()
+                except Exception as e:
+                    status[stage.name] = "failed"
+                    state["stages"].pop(stage.name, None)
+                    print(f"[失败] {stage.name}: {e}", file=sys.stderr)
+                    continue
+                status[stage.name] = "run"
+                collected.extend(stage_metrics)
+                state["stages"][stage.name] = {"fingerprint": fingerprint, "elapsed": round(elapsed, 3)}
+                print(f"[完成] {stage.name}: {elapsed:.2f}s", file=sys.stderr)
+            # 每完成一批就保存状态，中断后已完成的阶段不必重跑
+            state["files"] = hasher.known
+            save_state(state_file, state)
+
+    if not dry_run:
+        state["files"] = hasher.known
+        save_state(state_file, state)
+        if metrics_output:
+            metrics.write_report(metrics_output, collected)
+            print(f"运行指标已保存至 {metrics_output}", file=sys.stderr)
+    return status
+
+
+def copy_file(source, destination):
+    """combine 阶段：将DOI去重后的结果作为待筛选的合并论文列表，Parquet格式的结果转换为CSV"""
+    if columnar.is_columnar(source) and not columnar.is_columnar(destination):
+        columnar.convert(source, destination)
+    else:
+        shutil.copyfile(source, destination)
+
+
+def default_stages(input_dir="./input", spec_dir="./spec-csv", result_dir="./result", use_columnar=False,
+                   record_filter=None, extra_spec_files=()):
+    """
+    按当前目录结构声明流水线的各个阶段，use_columnar 为True时中间文件使用Parquet
+
+    record_filter 为 RecordFilter 时在解析阶段按纳入标准过滤记录，条件变化会使解析阶段重新运行。
+    合并阶段只读取解析阶段写出的文件，extra_spec_files 中手工整理的文件显式指定后才一起合并
+    """
+    import ingest
+    import check
+    import select_same_doi
+    import convert_bib
+    from specificate_csv import PARSER_VERSION
+
+    extension = columnar.PARQUET_EXTENSION if use_columnar else ".csv"
+    stages = []
+    spec_outputs = []
+    for path in sorted(ingest.find_input_files(input_dir)):
+        output = ingest.output_path_for(path, spec_dir, extension)
+        parser = ingest.PARSERS[os.path.splitext(path)[1].lower()]
+        version = convert_bib.PARSER_VERSION if parser == "bib" else PARSER_VERSION
+        params = {"input_path": path, "output_path": output}
+        if record_filter is not None:
+            params["record_filter"] = record_filter
+        stages.append(Stage(
+            f"ingest:{os.path.basename(path)}", ingest.ingest_file,
+            inputs=[path], outputs=[output],
+            params=params,
+            version=f"{parser}-v{version}",
+        ))
+        spec_outputs.append(output)
+
+    # spec-csv 中遗留或手工放入的其他文件不参与合并，除非显式指定
+    spec_files = sorted(set(spec_outputs) | set(extra_spec_files))
+    output = os.path.join(result_dir, "output" + extension)
+    duplicates = os.path.join(result_dir, "duplicate_dois.csv")
+    stages.append(Stage(
+        "merge", select_same_doi.process_csv_files,
+        inputs=spec_files, outputs=[output],
+        params={"directory": spec_dir, "combined_output": output, "duplicate_output": duplicates,
+                "files": spec_files},
+        deps=[stage.name for stage in stages],
+        version=f"merge-v{select_same_doi.MERGE_VERSION}",
+    ))
+
+    # 近似重复检测依赖numpy，未安装时跳过该分支
+    try:
+        import near_duplicate
+    except ImportError as e:
+        print(f"未启用 near_duplicate 阶段: {e}", file=sys.stderr)
+    else:
+        near_output = os.path.join(result_dir, "near_duplicates.csv")
+        stages.append(Stage(
+            "near_duplicate", near_duplicate.detect_near_duplicates,
+            inputs=[output], outputs=[near_output],
+            params={"input_file": output, "output_file": near_output},
+            deps=["merge"],
+        ))
+
+    combined = os.path.join(result_dir, "combined_paper.csv")
+    stages.append(Stage(
+        "combine", copy_file,
+        inputs=[output], outputs=[combined],
+        params={"source": output, "destination": combined},
+        deps=["merge"],
+    ))
+
+    screening = os.path.join(result_dir, "Screening.csv")
+    stages.append(Stage(
+        "screen", check.screen,
+        inputs=[combined], outputs=[screening],
+        params={"input_file": combined, "output_file": screening, "keywords": list(check.Check_Keywords),
+                "hits_output": os.path.join(result_dir, "Screening-keywords.csv"), "cache_file": check.DEFAULT_CACHE},
+        deps=["combine"],
+        version=f"match-v{check.MATCH_VERSION}",
+    ))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量式PRISMA预处理流水线")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数，默认使用全部CPU核")
+    parser.add_argument("--force", action="store_true", help="忽略指纹，重新运行全部阶段")
+    parser.add_argument("--dry-run", action="store_true", help="只显示需要运行的阶段")
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE, help="流水线状态文件")
+    parser.add_argument("--columnar", action="store_true", help="中间文件使用Parquet格式(需要pyarrow)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出逐条的调试信息和全部警告")
+    parser.add_argument("--metrics", default=None, help="将本次运行的各阶段指标保存为JSON或CSV")
+    parser.add_argument("--merge-extra", action="append", default=[], metavar="FILE",
+                        help="与解析结果一起合并的手工整理的spec-csv格式文件，可重复指定")
+    filters.add_arguments(parser)
+    args = parser.parse_args()
+    if args.verbose:
+        metrics.set_verbose()
+
+    stages = default_stages(use_columnar=args.columnar, record_filter=filters.from_args(args),
+                            extra_spec_files=args.merge_extra)
+    status = run_pipeline(stages, jobs=args.jobs, force=args.force,
+                          dry_run=args.dry_run, state_file=args.state, metrics_output=args.metrics)
+    counts = {s: list(status.values()).count(s) for s in ("run", "skip", "failed", "blocked")}
+    print(f"运行 {counts['run']} 个阶段，跳过 {counts['skip']} 个，失败 {counts['failed']} 个，"
+          f"阻塞 {counts['blocked']} 个", file=sys.stderr)
+    if counts["failed"] or counts["blocked"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+"""
+按相关度对待筛选论文排序(BM25 或 TF-IDF)
+
+check.py 只给出命中/未命中的判断；这里对 Title(存在时还有 Abstract 和 Author Keywords)
+中的词和相邻词对建立一次稀疏的 文档×词项 权重矩阵(CSR：indptr/indices/weights 三个 NumPy 数组)，
+关键词列表作为一个查询向量，所有记录的得分由一次稀疏矩阵-向量乘积得到。
+输出与 Screening.csv 格式相同，按得分降序排列并附加 Score 列，人工复核可以从最相关的论文开始。
+
+词的切分与 search_index 一致(小写化、连字符等价于空格)；相邻词对让 "super resolution"
+这样的短语作为整体加权，但不跨字段组成词对。
+
+用法: python rank.py [--input 文件] [--output 文件] [--top K] [--min-score S] [--scheme bm25|tfidf]
+默认读取 ./result/combined_paper.csv，结果写入 ./result/Screening.csv
+"""
+
+import sys
+import os
+import csv
+import time
+import argparse
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from keyword_matcher import DEFAULT_FIELDS
+from metrics import StageMetrics
+from search_index import tokenize
+
+# BM25 参数：k1 控制词频饱和速度，b 控制文档长度归一化的强度
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SCHEMES = ("bm25", "tfidf")
+
+# 输出中附加的得分列
+SCORE_COLUMN = "Score"
+
+
+def field_terms(tokens):
+    """一个字段的词项：各个词和相邻词对"""
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def query_terms(keywords):
+    """关键词列表的词项计数，重复出现的词项权重更高"""
+    terms = Counter()
+    for keyword in keywords:
+        terms.update(field_terms(tokenize(keyword)))
+    return terms
+
+
+class RelevanceIndex:
+    """
+    文档×词项的稀疏权重矩阵
+
+    add 逐条加入记录，只记录词频；第一次打分时按所选方案一次性计算全部权重。
+    第i条记录的词项是 indices[indptr[i]:indptr[i+1]]，对应权重在 weights 的同一区间。
+    """
+
+    def __init__(self, scheme="bm25", k1=BM25_K1, b=BM25_B):
+        if scheme not in SCHEMES:
+            raise ValueError(f"未知的打分方案: {scheme}，可选: {', '.join(SCHEMES)}")
+        self.scheme = scheme
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = {}
+        self._indptr = array('q', [0])
+        self._indices = array('i')
+        self._counts = array('f')
+        self._lengths = array('i')
+        self.weights = None
+
+    @property
+    def size(self):
+        return len(self._lengths)
+
+    def add(self, *fields):
+        """加入一条记录，返回它的编号(从0开始，与CSV中数据行的顺序一致)"""
+        vocabulary = self.vocabulary
+        counts = Counter()
+        length = 0
+        for field in fields:
+            tokens = tokenize(field)
+            length += len(tokens)
+            counts.update(field_terms(tokens))
+        for term, n in counts.items():
+            term_id = vocabulary.get(term)
+            if term_id is None:
+                term_id = vocabulary[term] = len(vocabulary)
+            self._indices.append(term_id)
+            self._counts.append(n)
+        self._indptr.append(len(self._indices))
+        self._lengths.append(length)
+        self.weights = None
+        return self.size - 1
+
+    def _compute_weights(self):
+        """由词频、文档频率和文档长度计算每个非零元素的权重"""
+        n_docs = self.size
+        self.indptr = np.array(self._indptr, dtype=np.int64)
+        self.indices = np.array(self._indices, dtype=np.int32)
+        tf = np.array(self._counts, dtype=np.float64)
+        df = np.bincount(self.indices, minlength=len(self.vocabulary))
+        row_sizes = np.diff(self.indptr)
+
+        if self.scheme == "bm25":
+            self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            lengths = np.array(self._lengths, dtype=np.float64)
+            avg_length = lengths.mean() if n_docs and lengths.mean() > 0 else 1.0
+            norm = np.repeat(self.k1 * (1 - self.b + self.b * lengths / avg_length), row_sizes)
+            weights = self.idf[self.indices] * tf * (self.k1 + 1) / (tf + norm)
+        else:
+            # 对数词频 × 平滑IDF，每行做L2归一化，得分即余弦相似度
+            self.idf = np.log((1 + n_docs) / (1 + df)) + 1
+            weights = (1 + np.log(tf)) * self.idf[self.indices]
+            squares = np.concatenate(([0.0], np.cumsum(weights ** 2)))
+            row_norms = np.sqrt(squares[self.indptr[1:]] - squares[self.indptr[:-1]])
+            row_norms[row_norms == 0] = 1.0
+            weights /= np.repeat(row_norms, row_sizes)
+        self.weights = weights.astype(np.float32)
+
+    def query_vector(self, terms):
+        """查询词项计数 -> 词表上的稠密查询向量，词表中没有的词项被忽略"""
+        if self.weights is None:
+            self._compute_weights()
+        query = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for term, n in terms.items():
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                query[term_id] = n
+        if self.scheme == "tfidf":
+            nonzero = query > 0
+            query[nonzero] = (1 + np.log(query[nonzero])) * self.idf[nonzero]
+            norm = np.linalg.norm(query)
+            if norm:
+                query /= norm
+        return query
+
+    def score(self, terms):
+        """所有记录对查询的得分(float64数组，下标为记录编号)"""
+        query = self.query_vector(terms)
+        if not self.size:
+            return np.zeros(0)
+        # 稀疏矩阵-向量乘积：逐元素乘以查询权重，再按行区间求和(前缀和相减，空行得0)
+        contributions = np.concatenate(([0.0], np.cumsum(self.weights * query[self.indices])))
+        return contributions[self.indptr[1:]] - contributions[self.indptr[:-1]]
+
+
+def select(scores, top=None, min_score=None):
+    """按得分降序(同分按记录顺序)选出得分为正且不低于 min_score 的记录编号，最多 top 条"""
+    threshold = 0.0 if min_score is None else min_score
+    candidates = np.flatnonzero((scores > 0) & (scores >= threshold))
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    if top is not None:
+        order = order[:top]
+    return order
+
+
+def build_index(input_file, fields=DEFAULT_FIELDS, scheme="bm25"):
+    """读取CSV并为其中存在的待筛选字段建立权重矩阵"""
+    index = RelevanceIndex(scheme)
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        columns = [field for field in fields if field in (reader.fieldnames or [])]
+        for row in reader:
+            index.add(*(row[c] for c in columns))
+    return index
+
+
+def write_ranked(input_file, order, scores, output_file, score_column=SCORE_COLUMN, extra=None):
+    """
+    按 order 的顺序写出 input_file 中对应的数据行，并在末尾附加得分列
+
+    extra 为 {列名: 按记录编号索引的值(序列或字典)}，这些列附加在得分列之后。
+    记录编号与 csv.DictReader 一致，不计空行。
+    """
+    extra = extra or {}
+    wanted = {int(doc): rank for rank, doc in enumerate(order)}
+    rows = [None] * len(wanted)
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        doc = -1
+        for row in reader:
+            if not row:
+                continue
+            doc += 1
+            rank = wanted.get(doc)
+            if rank is not None:
+                rows[rank] = row + [f"{scores[doc]:.4f}"] + [values[doc] for values in extra.values()]
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(header + [score_column] + list(extra))
+        writer.writerows(rows)
+    return len(rows)
+
+
+def rank_screen(input_file="./result/combined_paper.csv", output_file="./result/Screening.csv",
+                keywords=None, top=None, min_score=None, scheme="bm25"):
+    """
+    按关键词列表的相关度对论文排序，写出得分最高的记录
+
+    keywords 为None时使用 check.Check_Keywords；top 和 min_score 都为None时写出所有得分为正的记录。
+    返回按得分降序的记录编号数组
+    """
+    if keywords is None:
+        from check import Check_Keywords
+        keywords = Check_Keywords
+
+    stats = StageMetrics("rank")
+    index = build_index(input_file, scheme=scheme)
+    scores = index.score(query_terms(keywords))
+    order = select(scores, top, min_score)
+    write_ranked(input_file, order, scores, output_file)
+
+    stats.record(index.size)
+    stats.count("selected", len(order))
+    stats.count("vocabulary", len(index.vocabulary))
+    stats.finish()
+
+    print(f"排序完成。输出得分最高的 {len(order)} 篇论文。")
+    print(f"结果已保存至 {output_file}")
+    return order
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按关键词相关度(BM25/TF-IDF)对论文排序")
+    parser.add_argument("--input", default="./result/combined_paper.csv", help="待筛选的CSV文件")
+    parser.add_argument("--output", default="./result/Screening.csv", help="排序结果的输出文件")
+    parser.add_argument("--top", type=int, default=None, help="只输出得分最高的K条记录")
+    parser.add_argument("--min-score", type=float, default=None, help="只输出得分不低于该值的记录")
+    parser.add_argument("--scheme", choices=SCHEMES, default="bm25", help="打分方案")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"错误: 文件 {args.input} 不存在", file=sys.stderr)
+        sys.exit(1)
+    start = time.perf_counter()
+    rank_screen(args.input, args.output, top=args.top, min_score=args.min_score, scheme=args.scheme)
+    print(f"用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+纳入标准中的记录过滤条件：年份范围、DOI前缀、出版物白名单
+
+过滤条件直接交给各解析器(process_csv_file、process_txt_file、convert_bib)，在解析过程中
+尽早检查：CSV先只解码年份列，ACM引用在定位到DOI和年份后、切分标题和出版物之前检查，
+BibTeX在读到 year 字段时检查，不满足条件的条目不会被完整解析，也不会生成 Record。
+过滤条件是解析缓存键的一部分，不同条件下的解析结果分别缓存。
+ingest.py、pipeline.py 等通过 add_arguments 和 from_args 提供命令行参数。
+
+年份无法识别(如 "Unknown")的记录在指定年份范围时被排除；DOI为空的记录在指定DOI前缀时被排除。
+出版物按 keyword_matcher.normalize_text 归一化后比较(不区分大小写，连字符与空格等价)。
+"""
+
+import json
+import hashlib
+
+from keyword_matcher import normalize_text
+from records import normalize_doi
+
+# 被过滤的原因，解析器以 filtered.<原因> 为名计数
+REASON_YEAR = "year"
+REASON_DOI_PREFIX = "doi_prefix"
+REASON_VENUE = "venue"
+
+
+def parse_year(year):
+    """年份文本开头的四位数字，无法识别时返回None"""
+    if not year:
+        return None
+    year = year.strip()[:4]
+    if len(year) == 4 and year.isdigit():
+        return int(year)
+    return None
+
+
+class RecordFilter:
+    """年份范围(闭区间，任一端可为None)、DOI前缀和出版物白名单，未指定的条件不做限制"""
+
+    def __init__(self, min_year=None, max_year=None, doi_prefixes=(), venues=()):
+        self.min_year = min_year
+        self.max_year = max_year
+        self.doi_prefixes = tuple(sorted({normalize_doi(prefix) for prefix in doi_prefixes} - {""}))
+        self.venues = frozenset(normalize_text(venue) for venue in venues) - {""}
+        # 出版物的取值大量重复，缓存每个取值的判断结果
+        self._venue_results = {}
+
+    def __bool__(self):
+        return (self.min_year is not None or self.max_year is not None
+                or bool(self.doi_prefixes) or bool(self.venues))
+
+    @property
+    def has_year_range(self):
+        return self.min_year is not None or self.max_year is not None
+
+    def year_ok(self, year):
+        if not self.has_year_range:
+            return True
+        value = parse_year(year)
+        if value is None:
+            return False
+        return ((self.min_year is None or value >= self.min_year)
+                and (self.max_year is None or value <= self.max_year))
+
+    def doi_ok(self, doi):
+        return not self.doi_prefixes or normalize_doi(doi).startswith(self.doi_prefixes)
+
+    def venue_ok(self, publication):
+        if not self.venues:
+            return True
+        result = self._venue_results.get(publication)
+        if result is None:
+            result = self._venue_results[publication] = normalize_text(publication) in self.venues
+        return result
+
+    def rejects(self, record):
+        """检查一条 Record，满足全部条件时返回None，否则返回第一个不满足的原因"""
+        if not self.year_ok(record.year):
+            return REASON_YEAR
+        if not self.doi_ok(record.doi):
+            return REASON_DOI_PREFIX
+        if not self.venue_ok(record.publication):
+            return REASON_VENUE
+        return None
+
+    def as_dict(self):
+        return {
+            "min_year": self.min_year,
+            "max_year": self.max_year,
+            "doi_prefixes": list(self.doi_prefixes),
+            "venues": sorted(self.venues),
+        }
+
+    def cache_tag(self):
+        """附加在解析缓存的解析器名之后；没有任何条件时为空字符串，与不过滤时共用缓存"""
+        if not self:
+            return ""
+        encoded = json.dumps(self.as_dict(), sort_keys=True).encode('utf-8')
+        return "-filter-" + hashlib.sha256(encoded).hexdigest()[:16]
+
+    def __repr__(self):
+        # 流水线把参数转换为字符串计算阶段指纹，这里的输出必须与条件一一对应
+        return f"RecordFilter({json.dumps(self.as_dict(), sort_keys=True, ensure_ascii=False)})"
+
+
+def add_arguments(parser):
+    """为命令行解析器添加过滤条件参数"""
+    group = parser.add_argument_group("记录过滤(在解析时尽早排除)")
+    group.add_argument("--min-year", type=int, default=None, help="只保留该年及以后的记录")
+    group.add_argument("--max-year", type=int, default=None, help="只保留该年及以前的记录")
+    group.add_argument("--doi-prefix", action="append", default=[], metavar="PREFIX",
+                       help="只保留DOI以该前缀开头的记录(如 10.1093/)，可重复指定")
+    group.add_argument("--venue", action="append", default=[], metavar="NAME",
+                       help="只保留出版物在白名单中的记录，可重复指定")
+    group.add_argument("--venue-file", default=None, help="出版物白名单文件，每行一个")
+
+
+def from_args(args):
+    """由 add_arguments 添加的参数构造过滤条件，没有指定任何条件时返回None"""
+    venues = list(args.venue)
+    if args.venue_file:
+        with open(args.venue_file, 'r', encoding='utf-8') as f:
+            venues.extend(line.strip() for line in f if line.strip())
+    record_filter = RecordFilter(args.min_year, args.max_year, args.doi_prefix, venues)
+    return record_filter if record_filter else None
+
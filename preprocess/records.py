@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""
+各解析器共用的紧凑文献记录类型
+
+convert_bib、process_csv_file 和 process_txt_file 都产出 Record，
+write_csv_output 和 convert_bib 的写出函数直接按字段顺序写出。
+"""
+
+import sys
+
+# 字段顺序与输出CSV的列顺序一致
+FIELDS = ("author", "title", "year", "publication", "doi")
+
+# 输出CSV的表头
+CSV_HEADER = ("Author", "Title", "Year", "Publication", "DOI")
+
+# DOI的各种链接和标记前缀(小写)
+_DOI_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:")
+
+_intern = sys.intern
+
+
+def normalize_doi(doi):
+    """去掉 https://doi.org/、doi: 等前缀并小写化(DOI不区分大小写)，空值返回空字符串"""
+    if not doi:
+        return ""
+    doi = doi.strip().lower()
+    for prefix in _DOI_PREFIXES:
+        if doi.startswith(prefix):
+            doi = doi[len(prefix):].strip()
+            break
+    return doi.rstrip('.')
+
+
+class Record:
+    """
+    一条文献记录：作者、标题、年份、出版物、DOI
+
+    字段保存在 __slots__ 中，每条记录没有实例字典；年份和出版物的取值大量重复，
+    经过 intern 后取值相同的记录共享同一个字符串对象。迭代时按 FIELDS 顺序产出字段值，
+    可以直接交给 csv.writer.writerow。
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, author="Unknown", title="Unknown", year="Unknown", publication="Unknown", doi=""):
+        self.author = author
+        self.title = title
+        self.year = _intern(year)
+        self.publication = _intern(publication)
+        self.doi = doi
+
+    @classmethod
+    def from_dict(cls, entry):
+        """从 {字段名: 值} 字典构造，多余的键(如页码)被忽略"""
+        return cls(entry.get("author", "Unknown"), entry.get("title", "Unknown"), entry.get("year", "Unknown"),
+                   entry.get("publication", "Unknown"), entry.get("doi", ""))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def __iter__(self):
+        return iter((self.author, self.title, self.year, self.publication, self.doi))
+
+    def __reduce__(self):
+        # 按位置参数序列化，体积与元组相当，反序列化时重新 intern
+        return (Record, tuple(self))
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"Record({', '.join(f'{name}={getattr(self, name)!r}' for name in FIELDS)})"
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+"""
+用于交互式布尔筛选的内存倒排索引
+
+对合并后的论文列表(Title，存在时还有 Abstract 和 Author Keywords)只建一次带位置信息的倒排索引，
+之后每个检索式只需合并倒排表，例如:
+    ("super resolution" OR "resolution enhancement") AND spectra NOT image
+
+语法:
+    AND / OR / NOT  运算符(必须大写)，相邻的词之间默认是 AND；优先级 NOT > AND > OR
+    "..."           短语，要求各词在同一字段中连续出现
+    spectr*         前缀匹配
+    ( )             分组
+词和短语与 keyword_matcher 一样先小写化并统一连字符，"super-resolution" 等价于短语 "super resolution"。
+与 check.py 的子串匹配不同，索引按整词匹配，"resolution" 不会命中 "superresolution"。
+
+用法: python search_index.py [检索式] [--input 文件] [--output 文件]
+不给检索式时进入交互模式，每行一个检索式，":save [文件]" 保存上一次的结果。
+"""
+
+import sys
+import os
+import re
+import csv
+import time
+import bisect
+import argparse
+
+from keyword_matcher import DEFAULT_FIELDS, normalize_text
+
+_TOKEN_RE = re.compile(r'\w+')
+_QUERY_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"?|([^\s()"]+))')
+_OPERATORS = ("AND", "OR", "NOT")
+
+
+def tokenize(text):
+    """归一化后切分为词"""
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+class SearchIndex:
+    """
+    带位置信息的倒排索引：{词: {记录编号: [位置, ...]}}
+
+    同一记录的多个字段连续编号，字段之间空出一个位置，短语不会跨字段匹配。
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.size = 0
+        self._vocabulary = None
+
+    def add(self, *fields):
+        """加入一条记录，返回它的编号(从0开始，与CSV中数据行的顺序一致)"""
+        doc = self.size
+        self.size += 1
+        postings = self.postings
+        position = 0
+        for field in fields:
+            for token in tokenize(field):
+                positions = postings.setdefault(token, {}).setdefault(doc, [])
+                positions.append(position)
+                position += 1
+            position += 1
+        self._vocabulary = None
+        return doc
+
+    def _docs(self, token):
+        return self.postings.get(token, {})
+
+    def phrase(self, tokens):
+        """包含连续词序列的记录编号集合"""
+        if not tokens:
+            return set()
+        lists = [self._docs(token) for token in tokens]
+        if len(tokens) == 1:
+            return set(lists[0])
+        # 从最短的倒排表开始求交，再逐条检查位置
+        candidates = set(min(lists, key=len))
+        for docs in lists:
+            candidates.intersection_update(docs)
+            if not candidates:
+                return candidates
+        result = set()
+        for doc in candidates:
+            following = [set(docs[doc]) for docs in lists[1:]]
+            for start in lists[0][doc]:
+                if all(start + i in positions for i, positions in enumerate(following, 1)):
+                    result.add(doc)
+                    break
+        return result
+
+    def prefix(self, prefix):
+        """包含以 prefix 开头的词的记录编号集合"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        result = set()
+        for i in range(bisect.bisect_left(vocabulary, prefix), len(vocabulary)):
+            if not vocabulary[i].startswith(prefix):
+                break
+            result.update(self.postings[vocabulary[i]])
+        return result
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind == "phrase":
+            return self.phrase(node[1])
+        if kind == "prefix":
+            return self.prefix(node[1])
+        if kind == "or":
+            result = set()
+            for child in node[1]:
+                result |= self.evaluate(child)
+            return result
+        if kind == "and":
+            # 先对肯定条件求交，再减去否定条件，避免构造全集
+            positive = [child for child in node[1] if child[0] != "not"]
+            negative = [child[1] for child in node[1] if child[0] == "not"]
+            if positive:
+                sets = sorted((self.evaluate(child) for child in positive), key=len)
+                result = sets[0]
+                for other in sets[1:]:
+                    result &= other
+            else:
+                result = set(range(self.size))
+            for child in negative:
+                if not result:
+                    break
+                result -= self.evaluate(child)
+            return result
+        if kind == "not":
+            return set(range(self.size)) - self.evaluate(node[1])
+        raise ValueError(f"未知的查询节点: {kind}")
+
+    def search(self, query):
+        """返回满足检索式的记录编号(升序)"""
+        return sorted(self.evaluate(parse_query(query)))
+
+
+def _term_node(text, quoted):
+    if not quoted and text.endswith("*") and len(text) > 1:
+        prefix = normalize_text(text[:-1])
+        if not _TOKEN_RE.fullmatch(prefix):
+            raise ValueError(f"前缀只能是单个词: {text}")
+        return ("prefix", prefix)
+    tokens = tokenize(text)
+    if not tokens:
+        raise ValueError(f"检索词为空: {text!r}")
+    return ("phrase", tokens)
+
+
+def parse_query(query):
+    """
+    将检索式解析为语法树
+
+    节点为 ("or", [子节点]) / ("and", [子节点]) / ("not", 子节点) / ("phrase", [词]) / ("prefix", 前缀)
+    """
+    tokens = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = _QUERY_TOKEN_RE.match(query, pos)
+        if not match or match.end() == pos:
+            break
+        pos = match.end()
+        if match.group(1):
+            tokens.append(("(", None))
+        elif match.group(2):
+            tokens.append((")", None))
+        elif match.group(3) is not None:
+            tokens.append(("term", _term_node(match.group(3), True)))
+        elif match.group(4) in _OPERATORS:
+            tokens.append((match.group(4), None))
+        else:
+            tokens.append(("term", _term_node(match.group(4), False)))
+
+    index = 0
+
+    def peek():
+        return tokens[index][0] if index < len(tokens) else None
+
+    def parse_or():
+        nonlocal index
+        children = [parse_and()]
+        while peek() == "OR":
+            index += 1
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def parse_and():
+        nonlocal index
+        children = [parse_not()]
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                index += 1
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def parse_not():
+        nonlocal index
+        if peek() == "NOT":
+            index += 1
+            return ("not", parse_not())
+        return parse_primary()
+
+    def parse_primary():
+        nonlocal index
+        kind = peek()
+        if kind == "(":
+            index += 1
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("查询语法错误: 缺少右括号")
+            index += 1
+            return node
+        if kind == "term":
+            node = tokens[index][1]
+            index += 1
+            return node
+        raise ValueError(f"查询语法错误: 此处不应出现 {kind or '结尾'}")
+
+    if not tokens:
+        raise ValueError("检索式为空")
+    tree = parse_or()
+    if index != len(tokens):
+        raise ValueError(f"查询语法错误: 多余的 {peek()}")
+    return tree
+
+
+def build_index(input_file, fields=DEFAULT_FIELDS):
+    """读取CSV并为其中存在的待筛选字段建立索引"""
+    index = SearchIndex()
+    with open(input_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        columns = [field for field in fields if field in (reader.fieldnames or [])]
+        for row in reader:
+            index.add(*(row[c] for c in columns))
+    return index
+
+
+def write_records(input_file, ids, output_file):
+    """流式复制 input_file 中编号在 ids 内的数据行，写出与 Screening.csv 格式相同的文件"""
+    wanted = set(ids)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    written = 0
+    with open(input_file, 'r', encoding='utf-8', newline='') as f, \
+         open(output_file, 'w', encoding='utf-8', newline='') as out:
+        reader = csv.reader(f)
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(next(reader, []))
+        # 记录编号与建索引时的 csv.DictReader 一致，不计空行
+        doc = -1
+        for row in reader:
+            if not row:
+                continue
+            doc += 1
+            if doc in wanted:
+                writer.writerow(row)
+                written += 1
+    return written
+
+
+def screen_query(query, input_file="./result/combined_paper.csv", output_file="./result/Screening.csv"):
+    """按检索式筛选并写出结果，可作为流水线中 screen 阶段的替代"""
+    index = build_index(input_file)
+    ids = index.search(query)
+    write_records(input_file, ids, output_file)
+    print(f"筛选完成。找到 {len(ids)} 篇满足检索式的论文。")
+    print(f"结果已保存至 {output_file}")
+    return ids
+
+
+def interactive(index, input_file, output_file):
+    """逐行读取检索式并立即给出命中数，":save [文件]" 保存上一次的结果"""
+    last = None
+    prompt = "检索式> " if sys.stdin.isatty() else ""
+    while True:
+        try:
+            line = input(prompt).strip()
+        except EOFError:
+            break
+        if not line:
+            continue
+        if line.startswith(":save"):
+            if last is None:
+                print("还没有检索结果", file=sys.stderr)
+                continue
+            path = line[len(":save"):].strip() or output_file
+            count = write_records(input_file, last, path)
+            print(f"已将 {count} 条记录写入 {path}")
+            continue
+        try:
+            start = time.perf_counter()
+            last = index.search(line)
+            elapsed = time.perf_counter() - start
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            continue
+        print(f"命中 {len(last)} 条记录 ({elapsed * 1000:.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用倒排索引按布尔检索式筛选论文")
+    parser.add_argument("query", nargs="?", help="检索式，省略时进入交互模式")
+    parser.add_argument("--input", default="./result/combined_paper.csv", help="待筛选的CSV文件")
+    parser.add_argument("--output", default="./result/Screening.csv", help="筛选结果的输出文件")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.input)
+    print(f"已为 {index.size} 条记录建立索引，共 {len(index.postings)} 个词，"
+          f"用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    if args.query is None:
+        interactive(index, args.input, args.output)
+        return
+    try:
+        ids = index.search(args.query)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    count = write_records(args.input, ids, args.output)
+    print(f"筛选完成。找到 {count} 篇满足检索式的论文。")
+    print(f"结果已保存至 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""
+以最终纳入的论文为种子，在初始记录列表中查找相似的论文，避免遗漏相关文献
+
+每个标题归一化(同 near_duplicate)后切分为字符 n-gram，经带符号的特征哈希映射到固定维数的
+float32 向量并做L2归一化；一批记录的向量矩阵与种子矩阵相乘即得到全部余弦相似度，
+每条记录取与最相似种子的相似度作为得分。语料按块流式向量化，内存与块大小成正比。
+
+语料很大且需要反复用不同的种子查询时，可用 --index 建立近似索引：每条记录只保存
+随机投影到低维后的 float16 草图，查询时先用草图粗排，再对得分最高的一小部分候选
+重新计算精确相似度。索引与语料文件的内容摘要绑定，语料变化后自动重建。
+
+用法: python seed_expand.py [--seeds 文件] [--corpus 文件] [--output 文件] [--top K]
+                            [--min-similarity S] [--index 索引.npz]
+默认以 ../checking-flow/final-paper-list.csv 为种子，在 ../checking-flow/Initial_Record_List.csv 中查找，
+结果写入 ./result/seed-candidates.csv
+"""
+
+import sys
+import os
+import time
+import argparse
+
+import numpy as np
+
+from metrics import StageMetrics
+from near_duplicate import normalize_title, normalize_titles
+from parse_cache import file_digest
+from rank import write_ranked
+from records import normalize_doi
+from specificate_csv import iter_csv_columns
+
+# 哈希向量的维数(2的幂)和使用的字符 n-gram 长度(不超过4)
+DIMENSIONS = 512
+NGRAM_SIZES = (3, 4)
+
+# 每块向量化的记录数，控制临时数组大小
+BLOCK_SIZE = 16384
+
+# 近似索引中草图的维数，以及粗排后重新精确计算的候选数(相对于 top 的倍数和下限)
+SKETCH_DIMENSIONS = 128
+RERANK_FACTOR = 200
+MIN_RERANK = 20000
+
+DEFAULT_TOP = 100
+
+# 输出中附加的列
+SIMILARITY_COLUMN = "Similarity"
+NEAREST_SEED_COLUMN = "Nearest_Seed"
+
+_HASH_MULTIPLIER = np.uint32(2654435761)
+
+
+def vectorize(titles, dims=DIMENSIONS):
+    """
+    标题列表 -> (记录数, dims) 的L2归一化 float32 矩阵
+
+    所有标题(两端补空格，词首词尾的 n-gram 与词中的区分开)拼接为一个字节串，
+    每个 n-gram 直接读作一个32位整数(不足4字节的高位为0，不同长度的 n-gram 不会相同)，
+    经 multiply-shift 哈希后高位决定桶、下一位决定符号，哈希冲突的贡献在期望上相互抵消。
+    哈希、分桶和累加都对整个字节串向量化计算，不在Python中逐个 n-gram 循环。
+    """
+    bits = dims.bit_length() - 1
+    padded = [f" {title} " for title in normalize_titles(titles)]
+    n = len(padded)
+    lengths = np.fromiter(map(len, padded), dtype=np.int64, count=n)
+    # 末尾补3个字节，使最后一个位置也能读出完整的32位整数
+    data = "".join(padded).encode('ascii') + b"\0\0\0"
+    size = len(data) - 3
+    words = np.ndarray((size,), dtype='<u4', buffer=data, strides=(1,))
+    rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    remaining = lengths[rows] - (np.arange(size) - (np.cumsum(lengths) - lengths)[rows])
+
+    keys, signs = [], []
+    for ngram in NGRAM_SIZES:
+        starts = np.flatnonzero(remaining >= ngram)
+        h = words[starts]
+        if ngram < 4:
+            h = h & np.uint32((1 << (8 * ngram)) - 1)
+        h = h * _HASH_MULTIPLIER
+        keys.append(rows[starts] * dims + (h >> np.uint32(32 - bits)))
+        signs.append(((h >> np.uint32(31 - bits)) & np.uint32(1)).astype(np.float32) * 2 - 1)
+    counts = np.bincount(np.concatenate(keys), weights=np.concatenate(signs), minlength=n * dims)
+
+    matrix = counts.reshape(n, dims).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def read_corpus(corpus_file):
+    """语料中每条记录的 (标题列表, DOI列表)，顺序与CSV中数据行一致"""
+    titles, dois = [], []
+    for title, doi in iter_csv_columns(corpus_file, ("Title", "DOI")):
+        titles.append(title or "")
+        dois.append(doi)
+    return titles, dois
+
+
+def exact_scores(titles, seed_vectors, block_size=BLOCK_SIZE):
+    """逐块向量化语料并与种子矩阵相乘，返回(每条记录的最高相似度, 最相似种子的下标)"""
+    best = np.zeros(len(titles), dtype=np.float32)
+    nearest = np.zeros(len(titles), dtype=np.int32)
+    for start in range(0, len(titles), block_size):
+        similarities = vectorize(titles[start:start + block_size]) @ seed_vectors.T
+        end = start + len(similarities)
+        nearest[start:end] = similarities.argmax(axis=1)
+        best[start:end] = similarities[np.arange(len(similarities)), nearest[start:end]]
+    return best, nearest
+
+
+class ApproximateIndex:
+    """
+    语料向量的低维随机投影草图(float16)
+
+    随机高斯投影近似保持内积，草图上的相似度只用于粗排，最终得分仍按完整向量精确计算。
+    """
+
+    def __init__(self, sketches, digest, projection_seed=4450):
+        self.sketches = sketches
+        self.digest = digest
+        self.projection_seed = projection_seed
+
+    @staticmethod
+    def projection(seed, sketch_dims):
+        rng = np.random.default_rng(seed)
+        return (rng.standard_normal((DIMENSIONS, sketch_dims)) / np.sqrt(sketch_dims)).astype(np.float32)
+
+    @classmethod
+    def build(cls, titles, digest, sketch_dims=SKETCH_DIMENSIONS, block_size=BLOCK_SIZE):
+        projection = cls.projection(4450, sketch_dims)
+        sketches = np.empty((len(titles), sketch_dims), dtype=np.float16)
+        for start in range(0, len(titles), block_size):
+            block = vectorize(titles[start:start + block_size]) @ projection
+            sketches[start:start + len(block)] = block
+        return cls(sketches, digest)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # np.savez 会给没有 .npz 扩展名的路径补上扩展名，这里直接写入文件对象
+        with open(path, 'wb') as f:
+            np.savez(f, sketches=self.sketches, digest=self.digest,
+                     dims=DIMENSIONS, ngram_sizes=NGRAM_SIZES, projection_seed=self.projection_seed)
+
+    @classmethod
+    def load(cls, path, digest):
+        """读取索引，文件不存在、语料已变化或参数不一致时返回None"""
+        try:
+            with np.load(path) as data:
+                if (str(data["digest"]) != digest or int(data["dims"]) != DIMENSIONS
+                        or tuple(data["ngram_sizes"]) != NGRAM_SIZES):
+                    return None
+                return cls(data["sketches"], digest, int(data["projection_seed"]))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def candidates(self, seed_vectors, count):
+        """草图相似度最高的 count 条记录的编号"""
+        seed_sketches = seed_vectors @ self.projection(self.projection_seed, self.sketches.shape[1])
+        rough = np.full(len(self.sketches), -np.inf, dtype=np.float32)
+        for start in range(0, len(self.sketches), BLOCK_SIZE):
+            block = self.sketches[start:start + BLOCK_SIZE].astype(np.float32) @ seed_sketches.T
+            rough[start:start + len(block)] = block.max(axis=1)
+        if count >= len(rough):
+            return np.arange(len(rough))
+        return np.argpartition(-rough, count)[:count]
+
+
+def approximate_scores(titles, seed_vectors, index, rerank):
+    """用草图粗排选出 rerank 条候选并精确计算，其余记录的得分为0"""
+    candidates = np.sort(index.candidates(seed_vectors, rerank))
+    best = np.zeros(len(titles), dtype=np.float32)
+    nearest = np.zeros(len(titles), dtype=np.int32)
+    candidate_best, candidate_nearest = exact_scores([titles[i] for i in candidates], seed_vectors)
+    best[candidates] = candidate_best
+    nearest[candidates] = candidate_nearest
+    return best, nearest
+
+
+def expand(seeds_file="../checking-flow/final-paper-list.csv",
+           corpus_file="../checking-flow/Initial_Record_List.csv",
+           output_file="./result/seed-candidates.csv",
+           top=DEFAULT_TOP, min_similarity=None, index_file=None):
+    """
+    查找与种子相似的记录并按相似度降序写出，种子本身(按DOI或标题判断)不在结果中
+
+    返回写出的记录数
+    """
+    stats = StageMetrics("seed_expand")
+    seed_titles, seed_dois = read_corpus(seeds_file)
+    if not seed_titles:
+        print(f"错误: {seeds_file} 中没有种子记录", file=sys.stderr)
+        return 0
+    seed_vectors = vectorize(seed_titles)
+    titles, dois = read_corpus(corpus_file)
+
+    if index_file:
+        digest = file_digest(corpus_file)
+        index = ApproximateIndex.load(index_file, digest)
+        if index is None:
+            start = time.perf_counter()
+            index = ApproximateIndex.build(titles, digest)
+            index.save(index_file)
+            stats.count("index_built")
+            print(f"已建立近似索引 {index_file}，用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        rerank = max(MIN_RERANK, RERANK_FACTOR * (top or DEFAULT_TOP) + len(seed_titles))
+        best, nearest = approximate_scores(titles, seed_vectors, index, rerank)
+    else:
+        best, nearest = exact_scores(titles, seed_vectors)
+
+    # 排除种子本身：归一化DOI相同，或归一化标题相同(同一论文的预印本和正式版本DOI不同)；
+    # 只需检查得分为正的记录
+    seed_doi_set = {normalize_doi(doi) for doi in seed_dois} - {""}
+    seed_title_set = set(normalize_titles(seed_titles)) - {""}
+    seed_rows = [i for i in np.flatnonzero(best > 0).tolist()
+                 if normalize_doi(dois[i]) in seed_doi_set
+                 or (best[i] >= 0.999 and normalize_title(titles[i]) in seed_title_set)]
+    best[seed_rows] = 0
+    threshold = 0.0 if min_similarity is None else min_similarity
+    selected = np.flatnonzero((best > 0) & (best >= threshold))
+    order = selected[np.argsort(-best[selected], kind='stable')]
+    if top is not None:
+        order = order[:top]
+
+    extra = {NEAREST_SEED_COLUMN: {doc: seed_titles[nearest[doc]] for doc in order.tolist()}}
+    written = write_ranked(corpus_file, order, best, output_file, SIMILARITY_COLUMN, extra)
+
+    stats.record(len(titles))
+    stats.count("seeds", len(seed_titles))
+    stats.count("seeds_in_corpus", len(seed_rows))
+    stats.count("selected", written)
+    stats.finish()
+
+    print(f"找到 {written} 篇与 {len(seed_titles)} 篇种子论文相似的候选论文。")
+    print(f"结果已保存至 {output_file}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以最终纳入的论文为种子查找相似的候选论文")
+    parser.add_argument("--seeds", default="../checking-flow/final-paper-list.csv", help="种子论文列表")
+    parser.add_argument("--corpus", default="../checking-flow/Initial_Record_List.csv", help="候选记录列表")
+    parser.add_argument("--output", default="./result/seed-candidates.csv", help="结果输出文件")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="只输出相似度最高的K条记录")
+    parser.add_argument("--min-similarity", type=float, default=None, help="只输出相似度不低于该值的记录")
+    parser.add_argument("--index", default=None, help="使用(不存在时建立)近似索引文件，适用于很大的语料")
+    args = parser.parse_args()
+
+    for path in (args.seeds, args.corpus):
+        if not os.path.exists(path):
+            print(f"错误: 文件 {path} 不存在", file=sys.stderr)
+            sys.exit(1)
+    start = time.perf_counter()
+    expand(args.seeds, args.corpus, args.output, args.top, args.min_similarity, args.index)
+    print(f"用时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
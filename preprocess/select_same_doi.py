@@ -1,59 +1,200 @@
-import pandas as pd
+import csv
 import os
 import glob
+import time
+import hashlib
+import argparse
 
-def process_csv_files(directory='spec-csv', combined_output='./result/output.csv', duplicate_output='./result/duplicate_dois.csv'):
+import columnar
+from metrics import StageMetrics
+
+# 合并和去重逻辑改变时递增，使流水线重新运行 merge 阶段
+MERGE_VERSION = 1
+
+def doi_key(doi):
+    """
+    将DOI压缩为8字节哈希整数作为去重键，空DOI返回None(不参与去重)
+
+    内存中只保存这些整数键而不是完整的行或DOI字符串
+    """
+    doi = (doi or "").strip()
+    if not doi:
+        return None
+    return int.from_bytes(hashlib.blake2b(doi.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def iter_rows(files):
+    """依次流式读取每个CSV(或Parquet)文件的行(字典形式)"""
+    for file in files:
+        print(f"处理文件: {file}")
+        if columnar.is_columnar(file):
+            yield from columnar.iter_dict_rows(file)
+            continue
+        with open(file, 'r', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+
+def iter_dois(file):
+    """只读取一个文件的DOI列"""
+    if columnar.is_columnar(file):
+        yield from columnar.iter_column(file, 'DOI')
+        return
+    with open(file, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            yield row.get('DOI')
+
+def read_headers(files):
+    """按文件顺序合并所有文件的表头(与 pd.concat 的列顺序一致)"""
+    fieldnames = []
+    for file in files:
+        if columnar.is_columnar(file):
+            names = columnar.read_headers(file)
+        else:
+            with open(file, 'r', encoding='utf-8', newline='') as f:
+                names = next(csv.reader(f), [])
+        for name in names:
+            if name not in fieldnames:
+                fieldnames.append(name)
+    return fieldnames
+
+# 使用登记表时附加在输出中的列：记录首次出现的来源文件
+SOURCE_COLUMN = "First_Seen_Source"
+
+def process_csv_files(directory='spec-csv', combined_output='./result/output.csv', duplicate_output='./result/duplicate_dois.csv',
+                      registry=None, round_name=None, files=None):
     """
     处理目录中的所有CSV文件，找出重复DOI的行，并合并所有数据
-    
+
+    流式处理，内存中只保留DOI哈希键：第一遍只读DOI列统计出现次数，
+    第二遍逐行写出，总耗时与记录数成线性关系，可处理超出内存的语料。
+
+    给出 registry 时还与之前各轮的DOI登记表去重(见 doi_registry.py)：DOI按规范化形式比较，
+    之前轮次已登记的记录不再写出，本轮的新记录写出时附加首次出现的来源列并登记到表中。
+    同一轮次重复运行的结果不变。
+
     参数:
     directory -- 包含CSV文件的目录
     combined_output -- 合并所有数据的输出文件名(不含重复DOI)
     duplicate_output -- 重复DOI数据的输出文件名(每个重复DOI只保存一次)
+    registry -- DOI登记表文件，为None时不使用
+    round_name -- 本轮的名称，默认为当天日期
+    files -- 要合并的文件列表，给出时只合并这些文件，不再扫描 directory
     """
-    # 获取指定目录下的所有CSV文件
-    csv_files = glob.glob(os.path.join(directory, '*.csv'))
-    
+    if files is not None:
+        csv_files = list(files)
+    else:
+        # 获取指定目录下的所有CSV(和Parquet)文件
+        csv_files = sorted(glob.glob(os.path.join(directory, '*.csv')) +
+                           glob.glob(os.path.join(directory, '*' + columnar.PARQUET_EXTENSION)))
+
     if not csv_files:
         print(f"在{directory}目录下没有找到CSV文件")
         return
-    
-    # 创建一个空的DataFrame来存储所有数据
-    all_data = pd.DataFrame()
-    
-    # 读取并合并所有CSV文件
+
+    fieldnames = read_headers(csv_files)
+    if 'DOI' not in fieldnames:
+        print(f"{directory}目录下的CSV文件缺少DOI列")
+        return
+
+    stats = StageMetrics("select_same_doi")
+
+    key_of = doi_key
+    if registry:
+        import doi_registry
+        key_of = doi_registry.registry_key
+        round_name = round_name or time.strftime("%Y-%m-%d")
+        fieldnames = fieldnames + [SOURCE_COLUMN]
+
+    # 第一遍：只统计DOI键，seen为出现过的键，repeated为出现两次及以上的键
+    seen = set()
+    repeated = set()
     for file in csv_files:
-        print(f"处理文件: {file}")
-        df = pd.read_csv(file)
-        all_data = pd.concat([all_data, df], ignore_index=True)
-    
-    # 查找重复的DOI
-    duplicate_mask = all_data.duplicated(subset=['DOI'], keep=False)
-    duplicates = all_data[duplicate_mask]
-    
-    # 如果存在重复项
-    if not duplicates.empty:
-        # 找出唯一的重复DOI集合（每个重复DOI只保留一条记录）
-        unique_duplicates = duplicates.drop_duplicates(subset=['DOI'], keep='first')
-        
-        # 保存去重后的重复项到新的CSV文件
-        unique_duplicates.to_csv(duplicate_output, index=False)
-        print(f"发现{duplicates['DOI'].nunique()}个重复DOI，已保存到{duplicate_output}")
-        
-        # 去除重复的DOI，只保留第一次出现的记录
-        all_data_no_duplicates = all_data.drop_duplicates(subset=['DOI'], keep='first')
-        print(f"从合并数据中去除了{len(all_data) - len(all_data_no_duplicates)}个重复DOI记录")
-        
-        # 保存去重后的数据到输出文件
-        all_data_no_duplicates.to_csv(combined_output, index=False)
+        for doi in iter_dois(file):
+            key = key_of(doi)
+            if key is None:
+                continue
+            if key in seen:
+                repeated.add(key)
+            else:
+                seen.add(key)
+
+    # 批量查询本轮出现的DOI中哪些已经登记：之前轮次的记录跳过，本轮的沿用登记的来源
+    known = {}
+    new_records = []
+    if registry:
+        store = doi_registry.DoiRegistry(registry)
+        known = store.lookup_many(seen)
+    previous = {key for key, (_, registered_round) in known.items() if registered_round != round_name}
+    skipped_known = 0
+
+    # 第二遍：逐行写出，每个DOI只保留第一次出现的记录
+    total = 0
+    written = 0
+    duplicate_written = 0
+    os.makedirs(os.path.dirname(combined_output) or '.', exist_ok=True)
+    # 合并结果的扩展名为 .parquet 时写为Parquet，重复DOI报告总是CSV
+    columnar_output = columnar.is_columnar(combined_output)
+    with (columnar.DictWriter(combined_output, fieldnames) if columnar_output
+          else open(combined_output, 'w', encoding='utf-8', newline='')) as out, \
+         open(duplicate_output, 'w', encoding='utf-8', newline='') as dup:
+        out_writer = out if columnar_output else csv.DictWriter(out, fieldnames=fieldnames, lineterminator='\n')
+        dup_writer = csv.DictWriter(dup, fieldnames=fieldnames, lineterminator='\n')
+        out_writer.writeheader()
+        if repeated:
+            dup_writer.writeheader()
+
+        for file in csv_files:
+            source = os.path.basename(file)
+            for row in iter_rows([file]):
+                total += 1
+                key = key_of(row.get('DOI'))
+                if key in previous:
+                    skipped_known += 1
+                    continue
+                if registry:
+                    row[SOURCE_COLUMN] = known[key][0] if key in known else source
+                if key is not None:
+                    if key not in seen:
+                        # 已写出过的重复DOI
+                        continue
+                    # 写出后从seen中移除，内存随处理进度减少
+                    seen.discard(key)
+                    if key in repeated:
+                        dup_writer.writerow(row)
+                        duplicate_written += 1
+                    if registry and key not in known:
+                        new_records.append((key, doi_registry.canonical_doi(row.get('DOI')),
+                                            row.get('Title'), source, round_name))
+                out_writer.writerow(row)
+                written += 1
+
+    if registry:
+        registered = store.add_many(new_records)
+        store.close()
+        stats.count("registered", registered)
+        stats.count("previously_seen_rows", skipped_known)
+        print(f"跳过{skipped_known}条之前轮次已登记的记录，本轮(轮次 {round_name})新登记{registered}个DOI到{registry}")
+
+    stats.record(written)
+    stats.count("input_rows", total)
+    stats.count("duplicate_rows_removed", total - written - skipped_known)
+    stats.count("repeated_dois", len(repeated))
+    stats.finish()
+
+    if repeated:
+        print(f"发现{len(repeated)}个重复DOI，已保存到{duplicate_output}")
+        print(f"从合并数据中去除了{total - written - skipped_known}个重复DOI记录")
         print(f"去重后的数据已保存到 {combined_output}")
     else:
+        os.remove(duplicate_output)
         print("没有发现重复的DOI")
-        # 保存所有数据到一个新的CSV文件
-        all_data.to_csv(combined_output, index=False)
         print(f"所有数据已保存到 {combined_output}")
 
 # 执行主函数
 if __name__ == "__main__":
-    # 可以指定目录，默认为当前目录
-    process_csv_files()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="合并CSV文件并按DOI去重")
+    parser.add_argument("directory", nargs="?", default="spec-csv", help="包含CSV文件的目录")
+    parser.add_argument("--output", default="./result/output.csv", help="去重后的合并结果")
+    parser.add_argument("--duplicates", default="./result/duplicate_dois.csv", help="重复DOI的记录")
+    parser.add_argument("--registry", default=None, help="跨轮次的DOI登记表(SQLite)，与之前各轮已登记的记录去重")
+    parser.add_argument("--round", dest="round_name", default=None, help="本轮的名称，默认为当天日期")
+    args = parser.parse_args()
+    process_csv_files(args.directory, args.output, args.duplicates, args.registry, args.round_name)
@@ -8,6 +8,18 @@ import sys
 import csv
 import re
 import os
+import mmap
+import argparse
+
+import columnar
+import metrics
+import record_filter as filters
+from metrics import StageMetrics
+from parse_cache import cached_records
+from records import CSV_HEADER, Record
+
+# 解析逻辑改变时递增，使旧的解析缓存失效
+PARSER_VERSION = 2
 
 # 强制刷新stdout，确保输出可见
 sys.stdout.reconfigure(line_buffering=True)
@@ -15,27 +27,181 @@ sys.stdout.reconfigure(line_buffering=True)
 # 从stderr重定向debug输出
 debug_out = sys.stderr
 
-def process_csv_file(file_path):
-    """处理CSV文件，提取标题、作者、出版物和DOI信息"""
+# 列投影读取CSV所用的字段模式：带引号的字段内部可以包含逗号、换行和转义的双引号
+_QUOTED_FIELD = rb'"[^"]*(?:""[^"]*)*"'
+_BARE_FIELD = rb'[^,\r\n"]*'
+_SKIP_FIELD = rb'(?:' + _QUOTED_FIELD + rb'|' + _BARE_FIELD + rb')'
+_CAPTURE_FIELD = rb'(?:"([^"]*(?:""[^"]*)*)"|(' + _BARE_FIELD + rb'))'
+_RECORD_END = rb'(?:\r\n|\n|\r|\Z)'
+_FIELD_STOP_RE = re.compile(rb'[,\r\n]')
+_NEWLINE_RE = re.compile(rb'\r\n|\n|\r')
+
+
+def _decode(value):
+    text = value.decode('utf-8', 'replace')
+    # 与以文本模式打开文件时的换行转换保持一致
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _record_end(buf, pos):
+    """
+    找出从 pos 开始的一条记录的结束位置(换行符处)
+
+    与csv模块非strict模式的规则一致：字段以引号开头时引号内的逗号和换行不算分隔，
+    "" 为转义的引号；闭合引号后若跟着其他字符，该字段剩余部分中的引号按普通字符处理。
+    """
+    size = len(buf)
+    while pos < size:
+        if buf[pos:pos + 1] == b'"':
+            pos += 1
+            while True:
+                quote = buf.find(b'"', pos)
+                if quote == -1:
+                    return size
+                pos = quote + 1
+                if buf[pos:pos + 1] != b'"':
+                    break
+                pos += 1
+        stop = _FIELD_STOP_RE.search(buf, pos)
+        if stop is None:
+            return size
+        pos = stop.start()
+        if buf[pos:pos + 1] != b',':
+            return pos
+        pos += 1
+    return size
+
+
+def _read_record(buf, pos):
+    """用csv模块切分从 pos 开始的一条记录，返回(字段列表, 下一条记录的位置)"""
+    end = _record_end(buf, pos)
+    text = _decode(buf[pos:end])
+    newline = _NEWLINE_RE.match(buf, end)
+    next_pos = newline.end() if newline else end
+    return (next(csv.reader([text]), []) if text else []), next_pos
+
+
+def _compile_projection(wanted):
+    """为整行编译一个正则，只捕获 wanted 中的列(升序)，其后的列整体跳过"""
+    parts = []
+    for i in range(wanted[-1] + 1):
+        if i:
+            parts.append(b',')
+        parts.append(_CAPTURE_FIELD if i in wanted else _SKIP_FIELD)
+    parts.append(rb'(?:,' + _SKIP_FIELD + rb')*' + _RECORD_END)
+    return re.compile(b''.join(parts))
+
+
+def iter_projected_rows(buf, pos, columns, accept=None):
+    """
+    从 buf(bytes 或 mmap)的 pos 处开始，逐条产出 (columns 各列的值, 该行的列数)
+
+    columns 中为负数的列不读取，对应的值为 None；行中不存在的列同样为 None。
+    常见的行由预编译的整行正则一次匹配，只有所需的列被解码成字符串，
+    摘要、机构、主题词等其余列只被正则引擎跳过而不会生成对象；
+    空行、列数不足或引号不规范的行退回csv模块切分，结果与 csv.reader 相同。
+    快速路径产出的列数是所需最大列号+1(实际列数可能更多)。
+
+    accept 为 (columns 中的位置, 判断函数) 时先只解码该列，判断为假的行产出 (None, 列数)，
+    其余列不再解码。
+    """
+    wanted = sorted({c for c in columns if c >= 0})
+    if not wanted:
+        raise ValueError("至少需要读取一列")
+    pattern = _compile_projection(wanted)
+    width = wanted[-1] + 1
+    # 每个所需列在匹配结果中对应(带引号, 不带引号)两个分组
+    slots = [wanted.index(c) * 2 if c >= 0 else -1 for c in columns]
+    accept_index, predicate = accept if accept is not None else (None, None)
+    size = len(buf)
+    while pos < size:
+        match = None
+        if buf[pos:pos + 1] not in (b'\n', b'\r'):
+            match = pattern.match(buf, pos)
+        if match is not None:
+            groups = match.groups()
+            if predicate is not None:
+                slot = slots[accept_index]
+                if slot < 0:
+                    value = None
+                elif groups[slot] is not None:
+                    value = _decode(groups[slot].replace(b'""', b'"'))
+                else:
+                    value = _decode(groups[slot + 1])
+                if not predicate(value):
+                    pos = match.end()
+                    yield None, width
+                    continue
+            values = []
+            for slot in slots:
+                if slot < 0:
+                    values.append(None)
+                elif groups[slot] is not None:
+                    values.append(_decode(groups[slot].replace(b'""', b'"')))
+                else:
+                    values.append(_decode(groups[slot + 1]))
+            pos = match.end()
+            yield values, width
+        else:
+            row, pos = _read_record(buf, pos)
+            values = [row[c] if 0 <= c < len(row) else None for c in columns]
+            if predicate is not None and row and not predicate(values[accept_index]):
+                yield None, len(row)
+                continue
+            yield values, len(row)
+
+
+def iter_csv_columns(file_path, names):
+    """
+    按列名流式读取CSV中的若干列，逐行产出值列表(与 names 顺序一致，文件中不存在的列为 None)
+
+    与 csv.DictReader 一样跳过空行；其余列不会被解码。
+    """
+    if os.path.getsize(file_path) == 0:
+        return
+    with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        headers, pos = _read_record(buf, 0)
+        if headers:
+            headers[0] = headers[0].lstrip('\ufeff')
+        columns = [headers.index(name) if name in headers else -1 for name in names]
+        if all(c < 0 for c in columns):
+            return
+        for values, width in iter_projected_rows(buf, pos, columns):
+            if width:
+                yield values
+
+
+def process_csv_file(file_path, record_filter=None):
+    """
+    处理CSV文件，提取标题、作者、出版物和DOI信息
+
+    文件通过内存映射读取，每行只解码所需的五列，不会为IEEE Xplore导出中
+    其余的二十多列(包括很长的摘要)创建字符串。
+    record_filter 为 RecordFilter 时只保留满足条件的记录：指定了年份范围时每行先只解码年份列，
+    年份不符的行不再解码其他列。
+    """
     entries = []
+    stats = StageMetrics(f"csv:{os.path.basename(file_path)}", out=debug_out)
     
     try:
-        print(f"尝试打开文件: {file_path}", file=debug_out)
+        stats.trace(f"尝试打开文件: {file_path}")
         if not os.path.exists(file_path):
             print(f"错误: 文件不存在 - {file_path}", file=debug_out)
             return []
+        if os.path.getsize(file_path) == 0:
+            print("警告: CSV文件为空或无法读取表头", file=debug_out)
+            return []
             
-        with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
-            # 使用csv.reader处理CSV文件
-            csv_reader = csv.reader(file)
-            
+        with open(file_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
             # 读取表头以确定字段位置
-            headers = next(csv_reader, None)
+            headers, pos = _read_record(buf, 0)
             if not headers:
                 print("警告: CSV文件为空或无法读取表头", file=debug_out)
                 return []
                 
-            print(f"CSV表头: {headers}", file=debug_out)
+            stats.trace(f"CSV表头: {headers}")
             
             # 确定所需字段的索引位置
             title_idx = -1
@@ -58,7 +224,7 @@ def process_csv_file(file_path):
                 elif "year" in header_lower or ("publication" in header_lower and "year" in header_lower):
                     year_idx = i
             
-            print(f"字段索引 - 标题:{title_idx}, 作者:{author_idx}, 出版物:{publication_idx}, DOI:{doi_idx}, 年份:{year_idx}", file=debug_out)
+            stats.trace(f"字段索引 - 标题:{title_idx}, 作者:{author_idx}, 出版物:{publication_idx}, DOI:{doi_idx}, 年份:{year_idx}")
             
             # 如果找不到关键字段，尝试使用默认位置
             if title_idx == -1:
@@ -71,52 +237,51 @@ def process_csv_file(file_path):
                 publication_idx = 3
                 print(f"未找到出版物字段，使用默认位置 {publication_idx}", file=debug_out)
             
+            # 只读取这五列
+            columns = (title_idx, author_idx, publication_idx, doi_idx, year_idx)
+            required = max(title_idx, author_idx, publication_idx) + 1
+            
+            # 年份条件下推到逐行读取中，年份不符的行只解码年份一列
+            accept = None
+            if record_filter is not None and record_filter.has_year_range and year_idx >= 0:
+                accept = (4, record_filter.year_ok)
+            
             # 处理每一行
             row_count = 1  # 从1开始，因为第0行是表头
-            for row in csv_reader:
+            for values, width in iter_projected_rows(buf, pos, columns, accept):
                 row_count += 1
+                if values is None:
+                    stats.count(f"filtered.{filters.REASON_YEAR}")
+                    continue
                 
                 try:
-                    # 打印前几行用于调试
+                    # 详细模式下打印前几行用于调试
                     if row_count <= 5:
-                        print(f"第{row_count}行: {row}", file=debug_out)
+                        stats.trace(f"第{row_count}行: {values}")
                     
                     # 确保行有足够的列
-                    if not row or len(row) < max(title_idx, author_idx, publication_idx) + 1:
-                        print(f"警告: 第{row_count}行列数不足，跳过。行内容: {row}", file=debug_out)
+                    if width < required:
+                        stats.skip("short_row", f"警告: 第{row_count}行列数不足，跳过。行内容: {values}")
                         continue
                     
-                    # 提取数据，处理索引可能超出范围的情况
-                    title = row[title_idx].strip() if title_idx >= 0 and title_idx < len(row) else "Unknown"
-                    author = row[author_idx].strip() if author_idx >= 0 and author_idx < len(row) else "Unknown"
-                    publication = row[publication_idx].strip() if publication_idx >= 0 and publication_idx < len(row) else "Unknown"
-                    
-                    # 提取DOI，如果存在
-                    doi = ""
-                    if doi_idx >= 0 and doi_idx < len(row):
-                        doi = row[doi_idx].strip()
-                    
-                    # 提取年份，如果存在
-                    year = ""
-                    if year_idx >= 0 and year_idx < len(row):
-                        year = row[year_idx].strip()
+                    title, author, publication, doi, year = (v.strip() if v is not None else "" for v in values)
                     
                     # 如果DOI不是以http://doi.org/或https://doi.org/开头，则添加前缀
                     if doi and not doi.startswith(("http://doi.org/", "https://doi.org/")):
                         doi = f"https://doi.org/{doi}"
                     
-                    entries.append({
-                        "title": title,
-                        "author": author,
-                        "year": year,
-                        "publication": publication,
-                        "doi": doi
-                    })
+                    record = Record(author, title, year, publication, doi)
+                    if record_filter is not None:
+                        reason = record_filter.rejects(record)
+                        if reason is not None:
+                            stats.count(f"filtered.{reason}")
+                            continue
+                    entries.append(record)
                     
                 except Exception as e:
-                    print(f"处理第{row_count}行时出错: {e}", file=debug_out)
-                    print(f"行内容: {row}", file=debug_out)
+                    stats.warn("error", f"处理第{row_count}行时出错: {e}，行内容: {values}")
         
+        stats.record(len(entries))
         print(f"从CSV文件中处理了 {len(entries)} 条记录", file=debug_out)
         return entries
         
@@ -125,13 +290,204 @@ def process_csv_file(file_path):
         import traceback
         traceback.print_exc(file=debug_out)
         return []
+    finally:
+        stats.finish()
 
-def process_txt_file(file_path):
-    """处理TXT文件，从引用文本中提取标题、作者、出版物和DOI"""
+# ACM引用文本的预编译模式
+_DOI_RE = re.compile(r'https?://doi\.org/[^\s]+')
+# 年份候选，前后的单词边界在匹配后检查，避免在每个位置上计算 \b
+_YEAR_CANDIDATE_RE = re.compile(r'(?:19|20)\d\d')
+# 常见格式的行首：不含数字的作者紧跟年份，此时年份必然是行内第一个候选
+_HEAD_RE = re.compile(r'[^0-9]*(?<!\w)((?:19|20)[0-9][0-9])(?!\w)\s*')
+_ACM_PUBLISHER = "Association for Computing Machinery"
+# 出版商之后紧跟的第一个数字串就是页码时，一次匹配即可得到
+_PAGES_AFTER_ANCHOR_RE = re.compile(r'\D*(\d+[-–]\d+)')
+
+# 出版物前后需要清理的标点和空白(与正则 [.,\s] 相同的字符集)
+_PUBLICATION_TRIM_CHARS = ".," + "".join(c for c in map(chr, range(0x3001)) if c.isspace())
+
+# 引用无法解析时的跳过原因
+SKIP_JUST_ACCEPTED = "just_accepted"
+SKIP_NO_DOI = "no_doi"
+SKIP_NO_YEAR = "no_year"
+SKIP_NO_FIRST_DOT = "no_first_dot"
+SKIP_NO_TITLE_END = "no_title_end"
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+def _find_year(line):
+    """查找第一个前后都是单词边界的 19xx/20xx，等价于 re.search(r'\b(19|20)\d{2}\b', line)"""
+    pos = 0
+    while True:
+        match = _YEAR_CANDIDATE_RE.search(line, pos)
+        if match is None:
+            return None
+        start, end = match.span()
+        if (start == 0 or not _is_word_char(line[start - 1])) and \
+           (end == len(line) or not _is_word_char(line[end])):
+            return match.group()
+        pos = start + 1
+
+def _find_pages(text, start, end):
+    """
+    在 text[start:end] 中查找第一个 "数字-数字" 形式的页码，返回 (起始位置, 页码文本)
+
+    等价于 re.search(r'\d+[-–]\d+', text[start:end])，但只用 str.find 定位连字符，
+    不会在DOI等长数字串上回溯。
+    """
+    pos = start
+    while True:
+        hyphen = text.find('-', pos, end)
+        dash = text.find('–', pos, end)
+        if hyphen == -1 and dash == -1:
+            return -1, ""
+        sep = dash if hyphen == -1 or (dash != -1 and dash < hyphen) else hyphen
+        if sep > start and sep + 1 < end and text[sep - 1].isdecimal() and text[sep + 1].isdecimal():
+            left = sep - 1
+            while left > start and text[left - 1].isdecimal():
+                left -= 1
+            right = sep + 2
+            while right < end and text[right].isdecimal():
+                right += 1
+            return left, text[left:right]
+        pos = sep + 1
+
+def tokenize_citation(line, record_filter=None):
+    """
+    将一行(已去除首尾空白的)ACM引用切分为作者、年份、标题、出版物、页码和DOI
+
+    所有模式预先编译；常见格式由 _HEAD_RE 一次定位年份，句号、出版商和页码
+    都用 str.find 在原始行上按偏移量顺序查找，不再切片出中间字符串反复扫描。
+    返回 (字段字典, None)；无法解析时返回 (None, 跳过原因)。
+    record_filter 为 RecordFilter 时，DOI和年份一经定位即检查，不满足条件的行不再切分标题和出版物，
+    返回 (None, record_filter.REASON_*)。
+    """
+    # 跳过包含"Just Accepted"的行
+    if "Just Accepted" in line:
+        return None, SKIP_JUST_ACCEPTED
+
+    # 检查是否包含DOI
+    doi_match = _DOI_RE.search(line)
+    if doi_match is None:
+        return None, SKIP_NO_DOI
+    doi = doi_match.group()  # 完整的DOI URL
+    if record_filter is not None and not record_filter.doi_ok(doi):
+        return None, filters.REASON_DOI_PREFIX
+
+    head = _HEAD_RE.match(line)
+    if head is not None:
+        year = head.group(1)
+        year_pos = head.start(1)
+        base = head.end()
+    else:
+        # 查找四位数字(年份)
+        year = _find_year(line)
+        if year is None:
+            return None, SKIP_NO_YEAR
+        year_pos = line.find(year)
+
+        # 年份后的内容从 base 开始(跳过空白)
+        base = year_pos + 4
+        base += len(line) - base - len(line[base:].lstrip())
+
+    if record_filter is not None and not record_filter.year_ok(year):
+        return None, filters.REASON_YEAR
+
+    # 作者为从行开始到年份之前
+    author = line[:year_pos].strip()
+
+    # 标题为年份后第一个句号后到下一个句号前
+    first_dot = line.find('.', base)
+    if first_dot == -1:
+        return None, SKIP_NO_FIRST_DOT
+    second_dot = line.find('.', first_dot + 1)
+    if second_dot == -1:
+        return None, SKIP_NO_TITLE_END
+    title = line[first_dot + 1:second_dot].strip()
+
+    # 移除作者末尾的标点
+    if author[-1:] in ('.', ','):
+        author = author[:-1]
+
+    # 3. 会议信息(第二个句号后到第三个句号前) - 不保存
+    # 4. 出版商信息(第三个句号后到页码前)
+    pages = ""
+    third_dot = line.find('.', second_dot + 1)
+    if third_dot != -1:
+        start = third_dot + 1
+        # 优先以ACM或IEEE出版商为锚点查找页码
+        anchor = line.find(_ACM_PUBLISHER, start)
+        if anchor != -1:
+            anchor_end = anchor + len(_ACM_PUBLISHER)
+        else:
+            anchor = line.find("IEEE", start)
+            anchor_end = anchor + 4
+        if anchor != -1:
+            page_match = _PAGES_AFTER_ANCHOR_RE.match(line, anchor_end)
+            if page_match is not None:
+                end = page_match.start(1)
+                pages = page_match.group(1)
+            else:
+                end, pages = _find_pages(line, anchor, len(line))
+            if end == -1:
+                # 如果找不到页码，使用DOI位置作为结束
+                end = line.find(doi, base)
+                if end == -1:
+                    end = len(line)
+        else:
+            # 找不到明确的出版商，使用第三个句号到DOI(或其前的页码)的内容
+            end = line.find(doi, base)
+            if end != -1:
+                page_pos, pages = _find_pages(line, start, end)
+                if page_pos != -1:
+                    end = page_pos
+            else:
+                end = len(line)
+        publication = line[start:end]
+    else:
+        # 找不到第三个句号，使用第二个句号后到DOI(或其前的页码)的内容
+        start = second_dot + 1
+        start += len(line) - start - len(line[start:].lstrip())
+        end = line.find(doi, start)
+        if end != -1:
+            page_pos, pages = _find_pages(line, start, end)
+            if page_pos != -1:
+                end = page_pos
+            publication = line[start:end]
+        else:
+            publication = line[start:]
+
+    # 清理出版物前后的标点和空格
+    publication = publication.strip(_PUBLICATION_TRIM_CHARS)
+    if record_filter is not None and not record_filter.venue_ok(publication):
+        return None, filters.REASON_VENUE
+
+    return {
+        "title": title,
+        "author": author,
+        "year": year,
+        "publication": publication,
+        "pages": pages,
+        "doi": doi
+    }, None
+
+# 跳过原因对应的调试信息
+_SKIP_MESSAGES = {
+    SKIP_JUST_ACCEPTED: "跳过包含'Just Accepted'的引用",
+    SKIP_NO_DOI: "跳过没有DOI的引用",
+    SKIP_NO_YEAR: "无法解析引用中的年份",
+    SKIP_NO_FIRST_DOT: "无法找到年份后的第一个句号",
+    SKIP_NO_TITLE_END: "无法找到标题结束的句号",
+}
+
+def process_txt_file(file_path, record_filter=None):
+    """处理TXT文件，从引用文本中提取标题、作者、出版物和DOI，record_filter 的含义同 tokenize_citation"""
     entries = []
+    stats = StageMetrics(f"txt:{os.path.basename(file_path)}", out=debug_out)
     
     try:
-        print(f"尝试打开文件: {file_path}", file=debug_out)
+        stats.trace(f"尝试打开文件: {file_path}")
         if not os.path.exists(file_path):
             print(f"错误: 文件不存在 - {file_path}", file=debug_out)
             return []
@@ -144,131 +500,22 @@ def process_txt_file(file_path):
                 if not line:  # 跳过空行
                     continue
                 
-                # 打印前几行用于调试
+                # 详细模式下打印前几行用于调试
                 if line_count <= 5:
-                    print(f"第{line_count}行: {line[:100]}...", file=debug_out)
-                
-                # 跳过包含"Just Accepted"的行
-                if "Just Accepted" in line:
-                    print(f"跳过包含'Just Accepted'的引用 (第{line_count}行): {line[:50]}...", file=debug_out)
-                    continue
+                    stats.trace(f"第{line_count}行: {line[:100]}...")
                 
-                # 检查是否包含DOI
-                doi_match = re.search(r'https?://doi\.org/([^\s]+)', line)
-                if not doi_match:
-                    print(f"跳过没有DOI的引用 (第{line_count}行): {line[:50]}...", file=debug_out)
+                entry, reason = tokenize_citation(line, record_filter)
+                if entry is None:
+                    if reason in _SKIP_MESSAGES:
+                        stats.skip(reason, f"{_SKIP_MESSAGES[reason]} (第{line_count}行): {line[:50]}...")
+                    else:
+                        stats.count(f"filtered.{reason}")
                     continue
                 
-                doi = doi_match.group(0)  # 完整的DOI URL
-                
-                # 尝试提取年份 - 查找四位数字(年份)
-                year_match = re.search(r'\b(19|20)\d{2}\b', line)
-                if year_match:
-                    year = year_match.group(0)
-                    year_pos = line.find(year)
-                    
-                    # 1. 提取作者(从行开始到年份之前)
-                    author = line[:year_pos].strip()
-                    # 移除作者末尾的标点
-                    author = re.sub(r'[.,]\s*$', '', author)
-                    
-                    # 提取年份后的内容
-                    after_year = line[year_pos + len(year):].strip()
-                    
-                    # 2. 提取标题(年份后第一个句号后到下一个句号前)
-                    # 找到年份后的第一个句号
-                    first_dot = after_year.find('.')
-                    if first_dot != -1:
-                        # 标题从第一个句号后开始
-                        title_start = first_dot + 1
-                        # 找下一个句号作为标题结束
-                        second_dot = after_year.find('.', title_start)
-                        
-                        if second_dot != -1:
-                            title = after_year[title_start:second_dot].strip()
-                            
-                            # 3. 会议信息(第二个句号后到第三个句号前) - 不保存
-                            
-                            # 4. 出版商信息(第三个句号后到页码前)
-                            third_dot = after_year.find('.', second_dot + 1)
-                            if third_dot != -1:
-                                publisher_start = third_dot + 1
-                                
-                                # 找到"Association for Computing Machinery"
-                                acm_pos = after_year.find("Association for Computing Machinery", publisher_start)
-                                if acm_pos != -1:
-                                    # 找到页码(数字)
-                                    # 使用正则表达式查找页码格式: 数字-数字
-                                    page_match = re.search(r'\d+[-–]\d+', after_year[acm_pos:])
-                                    if page_match:
-                                        page_pos = after_year.find(page_match.group(0), acm_pos)
-                                        publisher_end = page_pos
-                                    else:
-                                        # 如果找不到页码，使用DOI位置作为结束
-                                        doi_pos_after_year = after_year.find(doi)
-                                        publisher_end = doi_pos_after_year if doi_pos_after_year != -1 else len(after_year)
-                                    
-                                    # 提取出版商信息
-                                    publication = after_year[publisher_start:publisher_end].strip()
-                                else:
-                                    # 如果找不到ACM，尝试找IEEE或其他出版商
-                                    ieee_pos = after_year.find("IEEE", publisher_start)
-                                    if ieee_pos != -1:
-                                        # 寻找页码
-                                        page_match = re.search(r'\d+[-–]\d+', after_year[ieee_pos:])
-                                        if page_match:
-                                            page_pos = after_year.find(page_match.group(0), ieee_pos)
-                                            publisher_end = page_pos
-                                        else:
-                                            doi_pos_after_year = after_year.find(doi)
-                                            publisher_end = doi_pos_after_year if doi_pos_after_year != -1 else len(after_year)
-                                        
-                                        publication = after_year[publisher_start:publisher_end].strip()
-                                    else:
-                                        # 如果找不到明确的出版商，尝试使用第三个句号到DOI的内容
-                                        doi_pos_after_year = after_year.find(doi)
-                                        if doi_pos_after_year != -1:
-                                            # 向前找最近的数字，可能是页码
-                                            page_match = re.search(r'\d+[-–]\d+', after_year[publisher_start:doi_pos_after_year])
-                                            if page_match:
-                                                publisher_end = after_year.find(page_match.group(0), publisher_start)
-                                            else:
-                                                publisher_end = doi_pos_after_year
-                                            
-                                            publication = after_year[publisher_start:publisher_end].strip()
-                                        else:
-                                            publication = after_year[publisher_start:].strip()
-                            else:
-                                # 如果找不到第三个句号，使用第二个句号后到DOI前的内容
-                                remaining = after_year[second_dot + 1:].strip()
-                                doi_pos_remaining = remaining.find(doi)
-                                if doi_pos_remaining != -1:
-                                    # 向前找最近的数字，可能是页码
-                                    page_match = re.search(r'\d+[-–]\d+', remaining[:doi_pos_remaining])
-                                    if page_match:
-                                        publication = remaining[:remaining.find(page_match.group(0))].strip()
-                                    else:
-                                        publication = remaining[:doi_pos_remaining].strip()
-                                else:
-                                    publication = remaining
-                            
-                            # 清理出版物前后的标点和空格
-                            publication = re.sub(r'^[.,\s]+|[.,\s]+$', '', publication)
-                            
-                            entries.append({
-                                "title": title,
-                                "author": author,
-                                "year": year,
-                                "publication": publication,
-                                "doi": doi
-                            })
-                        else:
-                            print(f"无法找到标题结束的句号 (第{line_count}行): {line[:50]}...", file=debug_out)
-                    else:
-                        print(f"无法找到年份后的第一个句号 (第{line_count}行): {line[:50]}...", file=debug_out)
-                else:
-                    print(f"无法解析引用中的年份 (第{line_count}行): {line[:50]}...", file=debug_out)
+                entries.append(Record(entry["author"], entry["title"], entry["year"],
+                                      entry["publication"], entry["doi"]))
         
+        stats.record(len(entries))
         print(f"从TXT文件中处理了 {len(entries)} 条记录", file=debug_out)
         return entries
         
@@ -277,26 +524,25 @@ def process_txt_file(file_path):
         import traceback
         traceback.print_exc(file=debug_out)
         return []
+    finally:
+        stats.finish()
 
 def write_csv_output(entries, output_file):
-    """将处理后的条目写入CSV文件"""
+    """将处理后的条目写入CSV文件，扩展名为 .parquet 时写为列式的Parquet文件"""
     try:
+        if columnar.is_columnar(output_file):
+            columnar.write_records(entries, output_file, CSV_HEADER)
+            print(f"已成功将 {len(entries)} 条记录写入到 {output_file}", file=debug_out)
+            return True
         with open(output_file, 'w', encoding='utf-8', newline='') as f:
             # 创建CSV写入器
             csv_writer = csv.writer(f, quoting=csv.QUOTE_ALL)
             
             # 写入表头
-            csv_writer.writerow(['Author', 'Title', 'Year', 'Publication', 'DOI'])
+            csv_writer.writerow(CSV_HEADER)
             
-            # 写入数据行
-            for entry in entries:
-                csv_writer.writerow([
-                    entry.get('author', 'Unknown'),
-                    entry.get('title', 'Unknown'),
-                    entry.get('year', 'Unknown'),
-                    entry.get('publication', 'Unknown'),
-                    entry.get('doi', '')
-                ])
+            # 写入数据行，Record 按表头顺序迭代字段
+            csv_writer.writerows(entries)
             
         print(f"已成功将 {len(entries)} 条记录写入到 {output_file}", file=debug_out)
         return True
@@ -307,21 +553,35 @@ def write_csv_output(entries, output_file):
         return False
 
 def main():
-    if len(sys.argv) < 4:
-        print("用法: python specificate_csv.py [csv|txt] <输入文件路径> <输出文件路径>", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(usage="python specificate_csv.py [csv|txt] <输入文件路径> <输出文件路径> "
+                                           "[--min-year Y] [--max-year Y] [--doi-prefix P] [--venue V] "
+                                           "[--verbose] [--metrics 报告.json]")
+    parser.add_argument("file_type")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出逐条的调试信息和全部警告")
+    parser.add_argument("--metrics", default=None, help="将运行指标保存为JSON或CSV")
+    filters.add_arguments(parser)
+    args = parser.parse_args()
+    if args.verbose:
+        metrics.set_verbose()
+    record_filter = filters.from_args(args)
     
-    file_type = sys.argv[1]
-    input_file = sys.argv[2]
-    output_file = sys.argv[3]
+    file_type = args.file_type
+    input_file = args.input_file
+    output_file = args.output_file
     
     print(f"处理文件类型: {file_type}, 输入文件: {input_file}, 输出文件: {output_file}", file=debug_out)
     
+    # 内容、解析器版本和过滤条件都未改变的输入直接读取缓存的解析结果
+    tag = record_filter.cache_tag() if record_filter is not None else ""
     entries = []
     if file_type.lower() == "csv":
-        entries = process_csv_file(input_file)
+        entries = list(cached_records(input_file, "csv" + tag, PARSER_VERSION,
+                                      lambda path: process_csv_file(path, record_filter)))
     elif file_type.lower() == "txt":
-        entries = process_txt_file(input_file)
+        entries = list(cached_records(input_file, "txt" + tag, PARSER_VERSION,
+                                      lambda path: process_txt_file(path, record_filter)))
     else:
         print(f"不支持的文件类型: {file_type}", file=sys.stderr)
         sys.exit(1)
@@ -335,6 +595,8 @@ def main():
     
     if success:
         print(f"CSV转换已完成，共 {len(entries)} 条记录已写入 {output_file}", file=debug_out)
+        if args.metrics:
+            metrics.write_report(args.metrics)
     else:
         print("CSV转换失败", file=sys.stderr)
         sys.exit(1)
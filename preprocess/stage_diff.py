@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+"""
+比较 checking-flow 目录中各阶段的论文列表
+
+每个阶段文件只读取 DOI 和 Title 两列，按归一化DOI(没有DOI的记录按归一化标题)
+压缩为8字节键，所有阶段合并到一个 {键: 阶段位掩码} 的哈希索引中；
+之后所有交集、差集、各阶段的纳入/排除数和两种初筛方式的一致性都只需统计位掩码的分布，
+内存与不同论文数成正比，与阶段文件的行数无关。
+
+用法: python stage_diff.py [目录] [--json 报告.json] [--export 阶段A 阶段B 输出.csv]
+--export 写出在阶段A中但不在阶段B中的记录。
+"""
+
+import sys
+import os
+import csv
+import json
+import argparse
+from collections import Counter
+
+from keyword_matcher import normalize_text
+from records import normalize_doi
+from select_same_doi import doi_key
+from specificate_csv import iter_csv_columns
+
+# 默认的阶段定义：(名称, 文件名, 上一阶段)
+# 两种初筛(代码关键词筛选和GPT-4o筛选)都从初始记录列表开始，人工复核后合并
+DEFAULT_STAGES = [
+    ("initial", "Initial_Record_List.csv", None),
+    ("screening-code", "screening-code.csv", "initial"),
+    ("screening-gpt", "screening-GPT-4o.csv", "initial"),
+    ("code-humanchecking", "screening-code-humanchecking.csv", "screening-code"),
+    ("gpt-humanchecking", "screening-GPT-4o-humanchecking.csv", "screening-gpt"),
+    ("combine", "screening-combine.csv", "initial"),
+    ("eligibility", "eigibility.csv", "combine"),
+    ("final", "final-paper-list.csv", "eligibility"),
+]
+
+# 需要计算一致性的两种筛选方式：(名称, 阶段A, 阶段B, 作为总体的阶段)
+AGREEMENT_PAIRS = [
+    ("代码 vs GPT-4o 初筛", "screening-code", "screening-gpt", "initial"),
+    ("代码 vs GPT-4o 人工复核后", "code-humanchecking", "gpt-humanchecking", "initial"),
+]
+
+
+def record_key(doi, title, normalized=False):
+    """
+    记录的去重键：优先使用归一化DOI，没有DOI时使用归一化标题，两者都没有返回None
+
+    normalized 为True表示 doi 已经过 normalize_doi
+    """
+    if not normalized:
+        doi = normalize_doi(doi)
+    if doi:
+        return doi_key(doi)
+    title = normalize_text(title)
+    if title:
+        return doi_key("title:" + title)
+    return None
+
+
+class StageIndex:
+    """{记录键: 阶段位掩码} 索引，以及每个阶段的行数统计"""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self.masks = {}
+        self.rows = Counter()
+        self.missing_doi = Counter()
+        self.unkeyed = Counter()
+
+    def add_file(self, name, path):
+        """流式读取一个阶段文件，把其中每条记录的键标记为属于该阶段"""
+        bit = self.bits[name]
+        masks = self.masks
+        for doi, title in iter_csv_columns(path, ("DOI", "Title")):
+            self.rows[name] += 1
+            doi = normalize_doi(doi)
+            if not doi:
+                self.missing_doi[name] += 1
+            key = record_key(doi, title, normalized=True)
+            if key is None:
+                self.unkeyed[name] += 1
+                continue
+            masks[key] = masks.get(key, 0) | bit
+
+    def histogram(self):
+        """各种阶段组合(位掩码)出现的论文数，阶段数为k时最多 2^k 项"""
+        return Counter(self.masks.values())
+
+
+def _count(histogram, include=0, exclude=0):
+    """属于 include 中全部阶段且不属于 exclude 中任何阶段的论文数"""
+    return sum(n for mask, n in histogram.items() if mask & include == include and not mask & exclude)
+
+
+def cohen_kappa(both, only_a, only_b, neither):
+    """两种二分类判断的 Cohen's kappa"""
+    total = both + only_a + only_b + neither
+    if total == 0:
+        return None
+    observed = (both + neither) / total
+    expected = ((both + only_a) * (both + only_b) + (only_b + neither) * (only_a + neither)) / total ** 2
+    if expected == 1:
+        return 1.0
+    return (observed - expected) / (1 - expected)
+
+
+def build_report(index, stages, pairs=AGREEMENT_PAIRS):
+    """由位掩码分布计算每个阶段的统计、相邻阶段的纳入/排除数、两两交集和一致性"""
+    histogram = index.histogram()
+    bits = index.bits
+    report = {"stages": [], "overlap": {}, "agreement": []}
+
+    for name, _, parent in stages:
+        bit = bits[name]
+        entry = {
+            "stage": name,
+            "rows": index.rows[name],
+            "papers": _count(histogram, bit),
+            "missing_doi": index.missing_doi[name],
+            "duplicate_rows": index.rows[name] - index.unkeyed[name] - _count(histogram, bit),
+        }
+        if parent:
+            parent_bit = bits[parent]
+            entry["parent"] = parent
+            entry["included"] = _count(histogram, bit | parent_bit)
+            entry["excluded"] = _count(histogram, parent_bit, bit)
+            # 不在上一阶段中的记录通常说明DOI被改写或有记录被手工加入
+            entry["not_in_parent"] = _count(histogram, bit, parent_bit)
+        report["stages"].append(entry)
+
+    names = [name for name, _, _ in stages]
+    for a in names:
+        report["overlap"][a] = {b: _count(histogram, bits[a] | bits[b]) for b in names}
+
+    for label, a, b, population in pairs:
+        if a not in bits or b not in bits or population not in bits:
+            continue
+        universe = bits[population]
+        both = _count(histogram, universe | bits[a] | bits[b])
+        only_a = _count(histogram, universe | bits[a], bits[b])
+        only_b = _count(histogram, universe | bits[b], bits[a])
+        neither = _count(histogram, universe, bits[a] | bits[b])
+        total = both + only_a + only_b + neither
+        kappa = cohen_kappa(both, only_a, only_b, neither)
+        report["agreement"].append({
+            "label": label, "a": a, "b": b, "population": population,
+            "both": both, "only_a": only_a, "only_b": only_b, "neither": neither,
+            "percent_agreement": (both + neither) / total if total else None,
+            "jaccard": both / (both + only_a + only_b) if both + only_a + only_b else None,
+            "kappa": kappa,
+        })
+    return report
+
+
+def print_report(report):
+    print(f"{'阶段':<20} {'行数':>8} {'论文数':>8} {'无DOI':>6} {'重复行':>6} {'纳入':>6} {'排除':>6} {'不在上阶段':>10}")
+    for s in report["stages"]:
+        if "parent" in s:
+            flow = f"{s['included']:>6} {s['excluded']:>6} {s['not_in_parent']:>10}"
+        else:
+            flow = f"{'-':>6} {'-':>6} {'-':>10}"
+        print(f"{s['stage']:<20} {s['rows']:>8} {s['papers']:>8} {s['missing_doi']:>6} {s['duplicate_rows']:>6} {flow}")
+
+    names = list(report["overlap"])
+    width = max(len(n) for n in names) + 1
+    print("\n两两交集(论文数):")
+    print(" " * width + "".join(f"{i:>6}" for i in range(len(names))))
+    for i, a in enumerate(names):
+        print(f"{a:<{width}}" + "".join(f"{report['overlap'][a][b]:>6}" for b in names) + f"  [{i}]")
+
+    for r in report["agreement"]:
+        kappa = f"{r['kappa']:.3f}" if r["kappa"] is not None else "-"
+        agreement = f"{r['percent_agreement']:.1%}" if r["percent_agreement"] is not None else "-"
+        print(f"\n{r['label']} (总体: {r['population']})")
+        print(f"  都纳入 {r['both']}，仅{r['a']} {r['only_a']}，仅{r['b']} {r['only_b']}，都排除 {r['neither']}")
+        print(f"  一致率 {agreement}，Cohen's kappa {kappa}")
+
+
+def export_difference(path, exclude_keys, output_file):
+    """写出 path 中键不在 exclude_keys 里的记录(保持原有列和顺序)，返回写出的行数"""
+    written = 0
+    with open(path, 'r', encoding='utf-8', newline='') as f, \
+         open(output_file, 'w', encoding='utf-8', newline='') as out:
+        reader = csv.DictReader(f)
+        writer = csv.DictWriter(out, fieldnames=reader.fieldnames or [], lineterminator='\n')
+        writer.writeheader()
+        for row in reader:
+            if record_key(row.get('DOI'), row.get('Title')) not in exclude_keys:
+                writer.writerow(row)
+                written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按归一化DOI比较 checking-flow 中各阶段的论文列表")
+    parser.add_argument("directory", nargs="?", default="../checking-flow", help="阶段文件所在目录")
+    parser.add_argument("--json", default=None, help="将统计结果保存为JSON")
+    parser.add_argument("--export", nargs=3, metavar=("A", "B", "OUTPUT"), help="写出在阶段A中但不在阶段B中的记录")
+    args = parser.parse_args()
+
+    stages = [(name, os.path.join(args.directory, filename), parent)
+              for name, filename, parent in DEFAULT_STAGES
+              if os.path.exists(os.path.join(args.directory, filename))]
+    if not stages:
+        print(f"在{args.directory}目录下没有找到阶段文件", file=sys.stderr)
+        sys.exit(1)
+    # 缺少的上一阶段不参与纳入/排除统计
+    present = {name for name, _, _ in stages}
+    stages = [(name, path, parent if parent in present else None) for name, path, parent in stages]
+
+    index = StageIndex(name for name, _, _ in stages)
+    for name, path, _ in stages:
+        index.add_file(name, path)
+
+    report = build_report(index, stages)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\n统计结果已保存至 {args.json}", file=sys.stderr)
+
+    if args.export:
+        a, b, output_file = args.export
+        paths = {name: path for name, path, _ in stages}
+        if a not in paths or b not in paths:
+            print(f"未知的阶段: {a if a not in paths else b}，可选: {', '.join(paths)}", file=sys.stderr)
+            sys.exit(1)
+        bit = index.bits[b]
+        exclude = {key for key, mask in index.masks.items() if mask & bit}
+        count = export_difference(paths[a], exclude, output_file)
+        print(f"{count} 条在 {a} 中但不在 {b} 中的记录已保存至 {output_file}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()